@@ -0,0 +1,207 @@
+# app/batcher.py
+import asyncio
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+import anyio
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.size = 0
+        self.full = asyncio.Event()
+
+
+class _Batcher:
+    """Coalesces concurrent submits that share a key into one blocking call.
+
+    The first submit for a key opens a batch and schedules a drain task; the
+    batch is flushed once it holds ``max_items`` units or ``max_wait`` seconds
+    have passed, whichever comes first. Subclasses implement ``_run``, which
+    executes in the threadpool and returns one result per queued item. If a
+    merged call fails, each item is retried on its own (concurrently) so the
+    error only reaches the callers whose items caused it.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[..., Any],
+        max_items: int,
+        max_wait: float,
+    ):
+        self._flush = flush
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._pending: Dict[Hashable, _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _enqueue(self, key: Hashable, size: int, item: Any) -> asyncio.Future:
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            task = asyncio.get_running_loop().create_task(self._drain(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        batch.size += size
+        if batch.size >= self.max_items:
+            self._close(key, batch)
+        return future
+
+    def _close(self, key: Hashable, batch: _Batch):
+        # Later submits start a fresh batch instead of joining this one
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        batch.full.set()
+
+    async def _drain(self, key: Hashable, batch: _Batch):
+        try:
+            await asyncio.wait_for(batch.full.wait(), self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        self._close(key, batch)
+
+        try:
+            results = await anyio.to_thread.run_sync(
+                partial(self._run, key, batch.items)
+            )
+        except Exception as exc:
+            if len(batch.items) == 1:
+                _set_exception(batch.futures[0], exc)
+                return
+            # Retry each item on its own, so an error only reaches the callers
+            # whose items caused it; the retries run side by side in the
+            # threadpool rather than one after another
+            await asyncio.gather(
+                *(
+                    self._retry(key, item, future)
+                    for item, future in zip(batch.items, batch.futures)
+                )
+            )
+            return
+
+        for future, result in zip(batch.futures, results):
+            _set_result(future, result)
+
+    async def _retry(self, key: Hashable, item: Any, future: asyncio.Future):
+        try:
+            (result,) = await anyio.to_thread.run_sync(partial(self._run, key, [item]))
+        except Exception as exc:
+            _set_exception(future, exc)
+        else:
+            _set_result(future, result)
+
+    def _run(self, key: Hashable, items: List[Any]) -> List[Any]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        """Flush all open batches and wait for in-flight calls."""
+        for key, batch in list(self._pending.items()):
+            self._close(key, batch)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def _set_result(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
+
+
+class AddBatcher(_Batcher):
+    """Merges concurrent adds to one collection into a single ``col.add``.
+
+    ``flush`` is a blocking callable ``(collection, ids, documents, metadatas)``.
+    ``submit`` (and ``check``) raise ``ValueError`` for an add whose lists
+    differ in length.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[..., Any],
+        max_items: int = 250,
+        max_wait: float = 0.05,
+    ):
+        super().__init__(flush, max_items, max_wait)
+
+    @staticmethod
+    def check(
+        ids: List[str],
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ):
+        # Items are joined positionally, so one with mismatched lengths would
+        # pair its documents with another caller's ids
+        if len(documents) != len(ids) or (
+            metadatas is not None and len(metadatas) != len(ids)
+        ):
+            raise ValueError("ids, documents and metadatas must have the same length")
+
+    async def submit(
+        self,
+        collection: str,
+        ids: List[str],
+        documents: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.check(ids, documents, metadatas)
+        # Chroma needs metadatas for all documents or none, so adds with and
+        # without metadata are batched separately
+        key = (collection, metadatas is not None)
+        return await self._enqueue(key, len(ids), (ids, documents, metadatas))
+
+    def _run(self, key: Hashable, items: List[Any]) -> List[Any]:
+        collection, has_metadatas = key
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: Optional[List[Dict[str, Any]]] = [] if has_metadatas else None
+        for item_ids, item_documents, item_metadatas in items:
+            ids.extend(item_ids)
+            documents.extend(item_documents)
+            if metadatas is not None:
+                metadatas.extend(item_metadatas)
+        self._flush(collection, ids, documents, metadatas)
+        return [None] * len(items)
+
+
+class QueryBatcher(_Batcher):
+    """Merges concurrent single-text queries into one multi-text ``col.query``.
+
+    ``flush`` is a blocking callable ``(collection, query_texts, n_results)``
+    returning a Chroma query result; each caller gets its own row back, shaped
+    like the result of a one-text query.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[..., Any],
+        max_items: int = 64,
+        max_wait: float = 0.005,
+    ):
+        super().__init__(flush, max_items, max_wait)
+
+    async def submit(self, collection: str, query_text: str, n_results: int):
+        return await self._enqueue((collection, n_results), 1, query_text)
+
+    def _run(self, key: Hashable, items: List[Any]) -> List[Any]:
+        collection, n_results = key
+        result = self._flush(collection, list(items), n_results)
+        return [_result_row(result, i) for i in range(len(items))]
+
+
+def _result_row(result: Dict[str, Any], index: int) -> Dict[str, Any]:
+    # Every field holds one entry per query text, except "included" (the list
+    # of returned fields) and fields that were not requested (None)
+    return {
+        key: value if key == "included" or value is None else [value[index]]
+        for key, value in result.items()
+    }
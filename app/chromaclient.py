@@ -1,11 +1,66 @@
 # app/chromaclient.py
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
 import chromadb
+import httpx
 from chromadb.config import Settings
 
-def get_chroma_client(host: str, port: int, ssl: bool):
-    return chromadb.HttpClient(
+# Chroma client settings, built once instead of on every client construction
+_CHROMA_SETTINGS = Settings()
+
+# Collection handles keyed by name, so repeated tool calls skip the metadata GET
+_COLLECTIONS: Dict[str, Any] = {}
+
+@lru_cache(maxsize=1)
+def get_chroma_client(host: str, port: int, ssl: bool, http2: bool = False):
+    # Cached so the HttpClient (and its connection pool) is shared across requests
+    client = chromadb.HttpClient(
         host=host,
         port=port,
         ssl=ssl,
-        settings=Settings()
+        settings=_CHROMA_SETTINGS
     )
+    if http2:
+        enable_http2(client)
+    return client
+
+def enable_http2(client):
+    # Chroma's HTTP API keeps an httpx.Client on client._server._session;
+    # swap it for an HTTP/2 one so parallel calls multiplex over a single
+    # connection. HTTP/2 is negotiated via TLS ALPN, so this only takes effect
+    # with ssl=True. The attribute path is internal, hence the guards.
+    server = getattr(client, "_server", None)
+    session = getattr(server, "_session", None)
+    if not isinstance(session, httpx.Client):
+        return False
+
+    verify = getattr(getattr(server, "_settings", None), "chroma_server_ssl_verify", None)
+    server._session = httpx.Client(
+        http2=True,
+        timeout=session.timeout,
+        limits=getattr(server, "http_limits", None)
+        or httpx.Limits(max_connections=100, max_keepalive_connections=100),
+        headers=session.headers,
+        verify=True if verify is None else verify,
+    )
+    session.close()
+    return True
+
+def get_collection_cached(client, name: str):
+    collection = _COLLECTIONS.get(name)
+    if collection is None:
+        collection = _COLLECTIONS[name] = client.get_collection(name)
+    return collection
+
+def get_or_create_collection_cached(client, name: str):
+    collection = _COLLECTIONS.get(name)
+    if collection is None:
+        collection = _COLLECTIONS[name] = client.get_or_create_collection(name)
+    return collection
+
+def clear_collection_cache(name: Optional[str] = None):
+    if name is None:
+        _COLLECTIONS.clear()
+    else:
+        _COLLECTIONS.pop(name, None)
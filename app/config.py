@@ -1,17 +1,31 @@
 # app/config.py
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl
 
 class Settings(BaseSettings):
+    # Frozen: the module-level instance is shared, so nothing may mutate it
+    model_config = SettingsConfigDict(env_file=".env", frozen=True)
+
     chroma_host: str = " chroma-db" # ChromaDB server hostname
     chroma_port: int = 8000
     chroma_ssl: bool = False
+    chroma_http2: bool = False # HTTP/2 to Chroma (TLS only, needs the http2 extra)
 
     # MCP HTTP/SSE Server
     server_host: str = "0.0.0.0"
     server_port: int = 8013 # MCP server port
+    # uvicorn worker processes; each has its own threadpool, Chroma client
+    # and batchers, so more workers also means smaller batches
+    workers: int = 1
+    dev_mode: bool = False # single worker with auto-reload
+    threadpool_size: int = 64 # worker threads for blocking Chroma calls
+
+    # Coalescing of concurrent tools/add_texts calls
+    add_batch_size: int = 250 # flush once this many documents are queued
+    add_batch_wait_ms: int = 50 # ...or after this long, whichever comes first
 
-    class Config:
-        env_file = ".env"
+    # Coalescing of concurrent single-text tools/query calls
+    query_batch_size: int = 64 # flush once this many queries are queued
+    query_batch_wait_ms: int = 5 # ...or after this long, whichever comes first
 
 settings = Settings()
@@ -1,16 +1,57 @@
 # app/main.py
+import logging
+from contextlib import asynccontextmanager
+
+import anyio
 from fastapi import FastAPI
-from app.routes import router
+from app.routes import router, get_client, add_batcher, query_batcher
 from app.config import settings
+from app.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Chroma calls run in the threadpool; size it for concurrent tool calls
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = settings.threadpool_size
+
+    # Build the shared Chroma client up front so the first tool call doesn't
+    # pay for client construction and the connection handshake; get_client
+    # is cached, so the handlers reuse it. If Chroma is not reachable yet,
+    # the client is created lazily on first use instead.
+    try:
+        await anyio.to_thread.run_sync(get_client)
+    except Exception:
+        logger.warning("Chroma not reachable at startup; connecting lazily", exc_info=True)
+
+    yield
+    # Don't drop calls that are still waiting for their batch window
+    await add_batcher.aclose()
+    await query_batcher.aclose()
+
 
-app = FastAPI(title="Chroma MCP HTTP/SSE Server")
+app = FastAPI(
+    title="Chroma MCP HTTP/SSE Server",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 app.include_router(router)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host=settings.server_host,
-        port=settings.server_port,
-        reload=True,
-    )
+    if settings.dev_mode:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.server_host,
+            port=settings.server_port,
+            reload=True,
+        )
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.server_host,
+            port=settings.server_port,
+            workers=settings.workers,
+        )
@@ -1,19 +1,25 @@
 # app/mcp_models.py
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any, Optional, Union
 
 class MCPQueryParams(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     collection: str
     query_texts: List[str]
     n_results: int = 5
 
 class MCPAddTextsParams(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     collection: str
     ids: List[str]
     documents: List[str]
     metadatas: Optional[List[Dict[str, Any]]] = None
 
 class MCPRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     jsonrpc: str = "2.0"
     id: str | int | None = None  # optional request ID
     method: str
@@ -0,0 +1,11 @@
+# app/responses.py
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+class ORJSONResponse(JSONResponse):
+    # orjson is several times faster than stdlib json for the result matrices
+    # Chroma returns, and serializes numpy arrays natively
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
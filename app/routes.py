@@ -1,122 +1,286 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from functools import partial
+
+import anyio
+import orjson
+from fastapi import APIRouter, Request, Response
+from fastapi.exceptions import RequestValidationError
+from chromadb.errors import NotFoundError
+from pydantic import ValidationError
 from app.mcp_models import MCPRequest, MCPQueryParams, MCPAddTextsParams
 from app.config import settings
-from app.chromaclient import get_chroma_client
+from app.responses import ORJSONResponse
+from app.batcher import AddBatcher, QueryBatcher
+from app.chromaclient import (
+    get_chroma_client,
+    get_collection_cached,
+    get_or_create_collection_cached,
+    clear_collection_cache,
+)
+
+__all__ = ["router", "get_client", "dispatch", "add_batcher", "query_batcher"]
 
 router = APIRouter()
 
+# Static tools/list payload, built once at import
+_TOOLS_LIST_RESULT = {
+    "tools": [
+        {
+            "name": "chroma.query",
+            "description": "Query documents from a Chroma collection",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "collection": {"type": "string"},
+                    "query_texts": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                    },
+                    "n_results": {
+                        "type": "integer",
+                        "default": 5,
+                    },
+                },
+                "required": ["collection", "query_texts"],
+            },
+        },
+        {
+            "name": "chroma.add_texts",
+            "description": "Add documents to a Chroma collection",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "collection": {"type": "string"},
+                    "ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                    },
+                    "documents": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                    },
+                },
+                "required": ["collection", "ids", "documents"],
+            },
+        },
+    ]
+}
+
+
+
+def static_envelope(result):
+    # Pre-serializes a constant JSON-RPC result; only the id is encoded per
+    # request and spliced in between the two halves
+    return (
+        b'{"jsonrpc":"2.0","id":',
+        b',"result":' + orjson.dumps(result) + b"}",
+    )
+
+
+def static_response(envelope, request_id):
+    head, tail = envelope
+    return Response(
+        content=head + orjson.dumps(request_id) + tail,
+        media_type="application/json",
+    )
+
+
+# Static initialize payload; the handshake only varies by request id
+_INIT_RESULT = {
+    "protocolVersion": "2024-11-05",
+    "serverInfo": {
+        "name": "chroma-mcp-http-server",
+        "version": "0.1.0",
+    },
+    "capabilities": {
+        "tools": {
+            "supported": True,
+            "listChanged": True,
+        }
+    },
+}
+
+_INIT_ENVELOPE = static_envelope(_INIT_RESULT)
+_TOOLS_LIST_ENVELOPE = static_envelope(_TOOLS_LIST_RESULT)
+
 
 def get_client():
+    # get_chroma_client is cached, so this always returns the same client
     return get_chroma_client(
         host=settings.chroma_host,
         port=settings.chroma_port,
         ssl=settings.chroma_ssl,
+        http2=settings.chroma_http2,
     )
 
 
-@router.post("/")
-@router.post("/mcp")
-async def handle_mcp(req: MCPRequest, client=Depends(get_client)):
-    # 1) Lifecycle
-    if req.method == "initialize":
-        return {
-            "jsonrpc": "2.0",
-            "id": req.id,
-            "result": {
-                "protocolVersion": "2024-11-05",
-                "serverInfo": {
-                    "name": "chroma-mcp-http-server",
-                    "version": "0.1.0",
-                },
-                "capabilities": {
-                    "tools": {
-                        "supported": True,
-                        "listChanged": True,
-                    }
-                },
-            },
-        }
+def _validation_error(exc, *prefix):
+    # Wrap a model ValidationError in the 422 FastAPI would have sent,
+    # with each loc rooted at where the value sits in the request
+    return RequestValidationError(
+        [
+            {**error, "loc": (*prefix, *error["loc"])}
+            for error in exc.errors(include_url=False)
+        ]
+    )
 
-    if req.method == "notifications/initialized":
-        # Notification, no response required
-        return {}
 
-    # 2) tools/list – advertise tools
-    if req.method == "tools/list":
-        return {
-            "jsonrpc": "2.0",
-            "id": req.id,
-            "result": {
-                "tools": [
-                    {
-                        "name": "chroma.query",
-                        "description": "Query documents from a Chroma collection",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "collection": {"type": "string"},
-                                "query_texts": {
-                                    "type": "array",
-                                    "items": {"type": "string"},
-                                },
-                                "n_results": {
-                                    "type": "integer",
-                                    "default": 5,
-                                },
-                            },
-                            "required": ["collection", "query_texts"],
-                        },
-                    },
-                    {
-                        "name": "chroma.add_texts",
-                        "description": "Add documents to a Chroma collection",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "collection": {"type": "string"},
-                                "ids": {
-                                    "type": "array",
-                                    "items": {"type": "string"},
-                                },
-                                "documents": {
-                                    "type": "array",
-                                    "items": {"type": "string"},
-                                },
-                            },
-                            "required": ["collection", "ids", "documents"],
-                        },
-                    },
-                ]
-            },
-        }
+def validate_arguments(model, args):
+    """Validate tool arguments against their model, raising a 422 on failure."""
+    try:
+        return model.__pydantic_validator__.validate_python(args)
+    except ValidationError as exc:
+        raise _validation_error(exc, "body", "params", "arguments")
 
-    # 3) tools/call – dispatch to your existing logic
-    if req.method == "tools/call":
-        tool_name = (req.params or {}).get("name")
-        args = (req.params or {}).get("arguments") or {}
-
-        if tool_name == "chroma.query":
-            params = MCPQueryParams(**args)
-            col = client.get_collection(params.collection)
-            res = col.query(
-                query_texts=params.query_texts,
-                n_results=params.n_results,
-            )
-            return {"jsonrpc": "2.0", "id": req.id, "result": res}
-
-        if tool_name == "chroma.add_texts":
-            params = MCPAddTextsParams(**args)
-            col = client.get_or_create_collection(params.collection)
-            col.add(
-                ids=params.ids,
-                documents=params.documents,
-                metadatas=params.metadatas,
+
+def query_collection(collection, query_texts, n_results):
+    client = get_client()
+    col = get_collection_cached(client, collection)
+    try:
+        return col.query(query_texts=query_texts, n_results=n_results)
+    except NotFoundError:
+        # Cached handle went stale (collection dropped); re-fetch once
+        clear_collection_cache(collection)
+        col = get_collection_cached(client, collection)
+        return col.query(query_texts=query_texts, n_results=n_results)
+
+
+def add_to_collection(collection, ids, documents, metadatas):
+    client = get_client()
+    col = get_or_create_collection_cached(client, collection)
+    try:
+        col.add(ids=ids, documents=documents, metadatas=metadatas)
+    except NotFoundError:
+        clear_collection_cache(collection)
+        col = get_or_create_collection_cached(client, collection)
+        col.add(ids=ids, documents=documents, metadatas=metadatas)
+
+
+# Concurrent single-text queries against the same collection share one
+# col.query, and concurrent add_texts calls share one col.add
+query_batcher = QueryBatcher(
+    query_collection,
+    max_items=settings.query_batch_size,
+    max_wait=settings.query_batch_wait_ms / 1000,
+)
+add_batcher = AddBatcher(
+    add_to_collection,
+    max_items=settings.add_batch_size,
+    max_wait=settings.add_batch_wait_ms / 1000,
+)
+
+
+def decode_request(body: bytes) -> MCPRequest:
+    # Fast path: well-formed envelopes are parsed with orjson and checked by
+    # hand, skipping model validation. Anything unusual goes through
+    # MCPRequest validation so clients get the usual 422 error details.
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        data = None
+
+    if isinstance(data, dict):
+        method = data.get("method")
+        request_id = data.get("id")
+        params = data.get("params")
+        jsonrpc = data.get("jsonrpc", "2.0")
+        if (
+            isinstance(method, str)
+            and isinstance(jsonrpc, str)
+            and (request_id is None or type(request_id) in (str, int))
+            and (params is None or isinstance(params, dict))
+        ):
+            return MCPRequest.model_construct(
+                jsonrpc=jsonrpc, id=request_id, method=method, params=params
             )
-            return {"jsonrpc": "2.0", "id": req.id, "result": "ok"}
 
-    # 4) Fallback: JSON-RPC error
-    return JSONResponse(
+    try:
+        return MCPRequest.model_validate_json(body)
+    except ValidationError as exc:
+        raise _validation_error(exc, "body")
+
+
+# 1) Lifecycle
+async def _initialize(req: MCPRequest):
+    return static_response(_INIT_ENVELOPE, req.id)
+
+
+async def _initialized(req: MCPRequest):
+    # Notification, no response required: acknowledge without a body
+    return Response(status_code=202)
+
+
+# 2) tools/list – advertise tools
+async def _tools_list(req: MCPRequest):
+    return static_response(_TOOLS_LIST_ENVELOPE, req.id)
+
+
+# 3) Tools – Chroma calls block on HTTP, so they run in the threadpool (or
+# a batcher that uses it) to keep the event loop free for other requests
+async def _query(req: MCPRequest, args):
+    params = validate_arguments(MCPQueryParams, args)
+    collection = params.collection
+    query_texts = params.query_texts
+    n_results = params.n_results
+    if len(query_texts) == 1:
+        res = await query_batcher.submit(collection, query_texts[0], n_results)
+    else:
+        res = await anyio.to_thread.run_sync(
+            partial(query_collection, collection, query_texts, n_results)
+        )
+    return {"jsonrpc": "2.0", "id": req.id, "result": res}
+
+
+async def _add_texts(req: MCPRequest, args):
+    params = validate_arguments(MCPAddTextsParams, args)
+    ids = params.ids
+    documents = params.documents
+    metadatas = params.metadatas
+    try:
+        AddBatcher.check(ids, documents, metadatas)
+    except ValueError as exc:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "value_error",
+                    "loc": ("body", "params", "arguments"),
+                    "msg": str(exc),
+                    "input": args,
+                }
+            ]
+        )
+    await add_batcher.submit(params.collection, ids, documents, metadatas)
+    return {"jsonrpc": "2.0", "id": req.id, "result": "ok"}
+
+
+_TOOLS = {
+    "chroma.query": _query,
+    "chroma.add_texts": _add_texts,
+}
+
+
+async def _tools_call(req: MCPRequest):
+    params = req.params or {}
+    name = params.get("name")
+    # Unhashable names (lists, objects) can't be looked up at all
+    tool = _TOOLS.get(name) if isinstance(name, str) else None
+    if tool is None:
+        return _method_not_found(req)
+    arguments = params.get("arguments")
+    return await tool(req, {} if arguments is None else arguments)
+
+
+# Direct tool methods, taking the tool arguments as params
+async def _tools_query(req: MCPRequest):
+    return await _query(req, req.params or {})
+
+
+async def _tools_add_texts(req: MCPRequest):
+    return await _add_texts(req, req.params or {})
+
+
+# 4) Fallback: JSON-RPC error
+def _method_not_found(req: MCPRequest):
+    return ORJSONResponse(
         status_code=200,
         content={
             "jsonrpc": "2.0",
@@ -127,3 +291,36 @@ async def handle_mcp(req: MCPRequest, client=Depends(get_client)):
             },
         },
     )
+
+
+_HANDLERS = {
+    "initialize": _initialize,
+    "notifications/initialized": _initialized,
+    "tools/list": _tools_list,
+    "tools/call": _tools_call,
+    "tools/query": _tools_query,
+    "tools/add_texts": _tools_add_texts,
+}
+
+
+# The body is read raw, so publish the request schema explicitly
+_MCP_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": MCPRequest.model_json_schema()}},
+    }
+}
+
+
+async def dispatch(req: MCPRequest) -> Response:
+    """Run a decoded MCP request through its method handler."""
+    handler = _HANDLERS.get(req.method)
+    if handler is None:
+        return _method_not_found(req)
+    return await handler(req)
+
+
+@router.post("/", openapi_extra=_MCP_OPENAPI)
+@router.post("/mcp", openapi_extra=_MCP_OPENAPI)
+async def handle_mcp(request: Request):
+    return await dispatch(decode_request(await request.body()))
@@ -3,17 +3,46 @@
 Global pytest configuration and shared fixtures.
 """
 import pytest
+import pytest_asyncio
+import httpx
 import os
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, create_autospec, patch
+from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
 from fastapi.testclient import TestClient
-from app.main import app
 from app.config import Settings
 
 
-@pytest.fixture
-def test_client():
-    """Create a FastAPI test client."""
-    return TestClient(app)
+@pytest.fixture(scope="session")
+def app():
+    """Import the FastAPI app on first use rather than at collection time."""
+    from app.main import app as _app
+    return _app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    """Create one test client, with the app started, for the whole session.
+
+    Server errors come back as 500 responses instead of being re-raised,
+    so the error-path tests can assert on the status code.
+    """
+    with patch('app.main.get_client'):
+        with TestClient(app, raise_server_exceptions=False) as test_client:
+            yield test_client
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def test_client(app):
+    """Create one async client that drives the ASGI app for the whole session.
+
+    Tests using it run on the session event loop
+    (``@pytest.mark.asyncio(loop_scope="session")``). Like ``client``, server
+    errors come back as 500 responses instead of being re-raised.
+    """
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
 
 
 @pytest.fixture
@@ -44,8 +73,16 @@ def mock_settings():
     settings.chroma_host = "test-host"
     settings.chroma_port = 8000
     settings.chroma_ssl = False
+    settings.chroma_http2 = False
     settings.server_host = "0.0.0.0"
     settings.server_port = 8013
+    settings.workers = 1
+    settings.dev_mode = False
+    settings.threadpool_size = 64
+    settings.add_batch_size = 250
+    settings.add_batch_wait_ms = 50
+    settings.query_batch_size = 64
+    settings.query_batch_wait_ms = 5
     return settings
 
 
@@ -57,8 +94,11 @@ def clean_env():
 
     # Clear relevant environment variables
     env_vars_to_clear = [
-        "CHROMA_HOST", "CHROMA_PORT", "CHROMA_SSL",
-        "SERVER_HOST", "SERVER_PORT"
+        "CHROMA_HOST", "CHROMA_PORT", "CHROMA_SSL", "CHROMA_HTTP2",
+        "SERVER_HOST", "SERVER_PORT", "WORKERS", "DEV_MODE",
+        "THREADPOOL_SIZE",
+        "ADD_BATCH_SIZE", "ADD_BATCH_WAIT_MS",
+        "QUERY_BATCH_SIZE", "QUERY_BATCH_WAIT_MS"
     ]
 
     for var in env_vars_to_clear:
@@ -164,13 +204,45 @@ def pytest_collection_modifyitems(config, items):
             item.add_marker(pytest.mark.unit)
 
 
+@pytest.fixture(scope="session")
+def real_get_client():
+    """The unpatched client accessor, captured before the per-test patches."""
+    from app.routes import get_client
+    return get_client
+
+
+@pytest.fixture(scope="session")
+def _chroma_mocks():
+    """Build the patched accessor and its client and collection mocks once.
+
+    The client and collection are specced on the real Chroma classes, so
+    misspelled methods and bad call signatures fail instead of silently
+    returning mocks.
+    """
+    return (
+        Mock(),
+        create_autospec(ClientAPI, instance=True),
+        create_autospec(Collection, instance=True),
+    )
+
+
 @pytest.fixture(autouse=True)
-def patch_get_client():
-    """Automatically patch get_client dependency in routes for all tests."""
-    with patch('app.routes.get_client') as mock:
-        mock_client = Mock()
-        mock_collection = Mock()
-        mock_client.get_collection.return_value = mock_collection
-        mock_client.get_or_create_collection.return_value = mock_collection
-        mock.return_value = mock_client
+def patch_get_client(_chroma_mocks):
+    """Automatically patch the cached client accessor for all tests.
+
+    The mocks are shared by the session; each test gets them reset, with
+    their recorded calls and per-test behavior cleared, and rewired.
+    """
+    from app.chromaclient import get_chroma_client, clear_collection_cache
+
+    get_chroma_client.cache_clear()
+    clear_collection_cache()
+    mock, mock_client, mock_collection = _chroma_mocks
+    for m in _chroma_mocks:
+        m.reset_mock(return_value=True, side_effect=True)
+    mock_client.get_collection.return_value = mock_collection
+    mock_client.get_or_create_collection.return_value = mock_collection
+    mock.return_value = mock_client
+    with patch('app.routes.get_client', mock), \
+            patch('app.main.get_client', mock):
         yield mock_client, mock_collection
\ No newline at end of file
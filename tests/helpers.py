@@ -0,0 +1,21 @@
+# tests/helpers.py
+"""
+Request helpers shared by the test modules.
+"""
+import orjson
+
+JSON_HEADERS = {"content-type": "application/json"}
+
+
+def post_json(client, path, body):
+    """POST a request body encoded with orjson instead of httpx's stdlib json.
+
+    Works with both the sync TestClient and an httpx.AsyncClient; with the
+    latter the returned coroutine must be awaited.
+    """
+    return client.post(path, content=orjson.dumps(body), headers=JSON_HEADERS)
+
+
+def read_json(resp):
+    """Decode a response body with orjson."""
+    return orjson.loads(resp.content)
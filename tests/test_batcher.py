@@ -0,0 +1,249 @@
+# tests/test_batcher.py
+import asyncio
+import threading
+import pytest
+from unittest.mock import Mock
+from app.batcher import AddBatcher, QueryBatcher
+
+
+class TestAddBatcher:
+    """Test cases for coalescing concurrent adds."""
+
+    def test_concurrent_adds_are_coalesced(self):
+        """Test that adds to one collection within the window share a flush."""
+        flush = Mock()
+        batcher = AddBatcher(flush, max_items=250, max_wait=0.01)
+
+        async def run():
+            await asyncio.gather(
+                batcher.submit("docs", ["id1"], ["doc1"]),
+                batcher.submit("docs", ["id2", "id3"], ["doc2", "doc3"]),
+            )
+
+        asyncio.run(run())
+
+        flush.assert_called_once_with(
+            "docs", ["id1", "id2", "id3"], ["doc1", "doc2", "doc3"], None
+        )
+
+    def test_collections_are_batched_separately(self):
+        """Test that each collection gets its own write."""
+        flush = Mock()
+        batcher = AddBatcher(flush, max_wait=0.01)
+
+        async def run():
+            await asyncio.gather(
+                batcher.submit("a", ["id1"], ["doc1"]),
+                batcher.submit("b", ["id2"], ["doc2"]),
+            )
+
+        asyncio.run(run())
+
+        assert flush.call_count == 2
+        collections = {c.args[0] for c in flush.call_args_list}
+        assert collections == {"a", "b"}
+
+    def test_metadata_and_plain_adds_not_mixed(self):
+        """Test that adds with and without metadatas are flushed apart."""
+        flush = Mock()
+        batcher = AddBatcher(flush, max_wait=0.01)
+
+        async def run():
+            await asyncio.gather(
+                batcher.submit("docs", ["id1"], ["doc1"], [{"k": "v"}]),
+                batcher.submit("docs", ["id2"], ["doc2"]),
+            )
+
+        asyncio.run(run())
+
+        assert flush.call_count == 2
+        flushed_metadatas = [c.args[3] for c in flush.call_args_list]
+        assert [{"k": "v"}] in flushed_metadatas
+        assert None in flushed_metadatas
+
+    def test_full_batch_flushes_early(self):
+        """Test that reaching max_items flushes without waiting."""
+        flush = Mock()
+        batcher = AddBatcher(flush, max_items=2, max_wait=10)
+
+        async def run():
+            await asyncio.wait_for(
+                asyncio.gather(
+                    batcher.submit("docs", ["id1"], ["doc1"]),
+                    batcher.submit("docs", ["id2"], ["doc2"]),
+                ),
+                timeout=1,
+            )
+
+        asyncio.run(run())
+
+        flush.assert_called_once_with("docs", ["id1", "id2"], ["doc1", "doc2"], None)
+
+    def test_flush_error_propagates_to_all_submitters(self):
+        """Test that a write failing for every item fails every add in the batch."""
+        flush = Mock(side_effect=Exception("ChromaDB error"))
+        batcher = AddBatcher(flush, max_wait=0.01)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.submit("docs", ["id1"], ["doc1"]),
+                batcher.submit("docs", ["id2"], ["doc2"]),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(r, Exception) for r in results)
+        # The merged write, then one retry per add
+        assert flush.call_count == 3
+
+    def test_flush_error_reaches_only_the_failing_add(self):
+        """Test that one bad add does not fail the adds batched with it."""
+        def flush(collection, ids, documents, metadatas):
+            if "bad" in documents:
+                raise ValueError("rejected document")
+
+        batcher = AddBatcher(flush, max_wait=0.01)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.submit("docs", ["id1"], ["good"]),
+                batcher.submit("docs", ["id2"], ["bad"]),
+                return_exceptions=True,
+            )
+
+        good, bad = asyncio.run(run())
+
+        assert good is None
+        assert isinstance(bad, ValueError)
+
+    def test_retries_run_concurrently(self):
+        """Test that the per-add retries after a failed write overlap."""
+        # Each retry waits for the other, so sequential retries would time out
+        barrier = threading.Barrier(2, timeout=1)
+
+        def flush(collection, ids, documents, metadatas):
+            if len(ids) > 1:
+                raise ValueError("merged write rejected")
+            barrier.wait()
+
+        batcher = AddBatcher(flush, max_wait=0.01)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.submit("docs", ["id1"], ["doc1"]),
+                batcher.submit("docs", ["id2"], ["doc2"]),
+                return_exceptions=True,
+            )
+
+        assert asyncio.run(run()) == [None, None]
+
+    def test_duplicate_id_across_adds(self):
+        """Test that two adds sharing an id both succeed via separate writes."""
+        writes = []
+
+        def flush(collection, ids, documents, metadatas):
+            # Chroma rejects a single add that repeats an id
+            if len(set(ids)) != len(ids):
+                raise ValueError(f"Expected IDs to be unique, found duplicates in {ids}")
+            writes.append(ids)
+
+        batcher = AddBatcher(flush, max_wait=0.01)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.submit("docs", ["id1"], ["doc1"]),
+                batcher.submit("docs", ["id1", "id2"], ["doc1", "doc2"]),
+            )
+
+        assert asyncio.run(run()) == [None, None]
+        assert writes == [["id1"], ["id1", "id2"]]
+
+    @pytest.mark.parametrize("ids,documents,metadatas", [
+        (["a1", "a2"], ["A1"], None),
+        (["b1"], ["B1", "B2"], None),
+        (["c1"], ["C1"], [{"k": "v"}, {"k": "w"}]),
+    ])
+    def test_mismatched_lengths_rejected(self, ids, documents, metadatas):
+        """Test that an add whose lists differ in length never joins a batch."""
+        flush = Mock()
+        batcher = AddBatcher(flush, max_wait=0.01)
+
+        with pytest.raises(ValueError):
+            asyncio.run(batcher.submit("docs", ids, documents, metadatas))
+
+        flush.assert_not_called()
+
+    def test_aclose_flushes_pending_batches(self):
+        """Test that shutdown flushes batches still inside their window."""
+        flush = Mock()
+        batcher = AddBatcher(flush, max_wait=10)
+
+        async def run():
+            submit = asyncio.ensure_future(batcher.submit("docs", ["id1"], ["doc1"]))
+            await asyncio.sleep(0)
+            await batcher.aclose()
+            await submit
+
+        asyncio.run(run())
+
+        flush.assert_called_once()
+
+
+class TestQueryBatcher:
+    """Test cases for coalescing concurrent single-text queries."""
+
+    def test_concurrent_queries_are_coalesced(self):
+        """Test that queries share one multi-text call and get their own row."""
+        flush = Mock(return_value={
+            "ids": [["a1"], ["b1"]],
+            "documents": [["doc a"], ["doc b"]],
+            "metadatas": [[{}], [{}]],
+            "distances": [[0.1], [0.2]],
+            "embeddings": None,
+            "included": ["documents", "metadatas"],
+        })
+        batcher = QueryBatcher(flush, max_wait=0.01)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.submit("docs", "query a", 1),
+                batcher.submit("docs", "query b", 1),
+            )
+
+        first, second = asyncio.run(run())
+
+        flush.assert_called_once_with("docs", ["query a", "query b"], 1)
+        assert first == {
+            "ids": [["a1"]],
+            "documents": [["doc a"]],
+            "metadatas": [[{}]],
+            "distances": [[0.1]],
+            "embeddings": None,
+            "included": ["documents", "metadatas"],
+        }
+        assert second["ids"] == [["b1"]]
+        assert second["distances"] == [[0.2]]
+
+    def test_different_n_results_not_mixed(self):
+        """Test that queries with different n_results are sent separately."""
+        flush = Mock(return_value={"ids": [["a1"]]})
+        batcher = QueryBatcher(flush, max_wait=0.01)
+
+        async def run():
+            await asyncio.gather(
+                batcher.submit("docs", "query a", 1),
+                batcher.submit("docs", "query b", 2),
+            )
+
+        asyncio.run(run())
+
+        assert flush.call_count == 2
+
+    def test_single_query_matches_direct_call(self):
+        """Test that a lone query returns the flush result unchanged."""
+        result = {"ids": [["id1", "id2"]], "distances": [[0.1, 0.2]]}
+        flush = Mock(return_value=result)
+        batcher = QueryBatcher(flush, max_wait=0)
+
+        assert asyncio.run(batcher.submit("docs", "query", 2)) == result
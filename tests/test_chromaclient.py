@@ -1,21 +1,29 @@
 # tests/test_chromaclient.py
 import pytest
+import httpx
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
-from app.chromaclient import get_chroma_client
+from app.chromaclient import (
+    get_chroma_client,
+    enable_http2,
+    _CHROMA_SETTINGS,
+    get_collection_cached,
+    get_or_create_collection_cached,
+    clear_collection_cache,
+)
 
 
 class TestChromaClient:
     """Test cases for ChromaDB client functions."""
 
     @patch('app.chromaclient.chromadb.HttpClient')
-    @patch('app.chromaclient.Settings')
+    @patch('app.chromaclient._CHROMA_SETTINGS')
     def test_get_chroma_client_creation(self, mock_settings, mock_http_client):
         """Test ChromaDB client creation with correct parameters."""
         # Arrange
         mock_client_instance = Mock()
         mock_http_client.return_value = mock_client_instance
-        mock_settings_instance = Mock()
-        mock_settings.return_value = mock_settings_instance
+        mock_settings_instance = mock_settings
 
         host = "localhost"
         port = 8000
@@ -25,7 +33,6 @@ class TestChromaClient:
         result = get_chroma_client(host, port, ssl)
 
         # Assert
-        mock_settings.assert_called_once()
         mock_http_client.assert_called_once_with(
             host=host,
             port=port,
@@ -35,14 +42,13 @@ class TestChromaClient:
         assert result == mock_client_instance
 
     @patch('app.chromaclient.chromadb.HttpClient')
-    @patch('app.chromaclient.Settings')
+    @patch('app.chromaclient._CHROMA_SETTINGS')
     def test_get_chroma_client_with_ssl(self, mock_settings, mock_http_client):
         """Test ChromaDB client creation with SSL enabled."""
         # Arrange
         mock_client_instance = Mock()
         mock_http_client.return_value = mock_client_instance
-        mock_settings_instance = Mock()
-        mock_settings.return_value = mock_settings_instance
+        mock_settings_instance = mock_settings
 
         host = "secure-host.com"
         port = 443
@@ -61,14 +67,13 @@ class TestChromaClient:
         assert result == mock_client_instance
 
     @patch('app.chromaclient.chromadb.HttpClient')
-    @patch('app.chromaclient.Settings')
+    @patch('app.chromaclient._CHROMA_SETTINGS')
     def test_get_chroma_client_different_ports(self, mock_settings, mock_http_client):
         """Test ChromaDB client creation with different port values."""
         # Arrange
         mock_client_instance = Mock()
         mock_http_client.return_value = mock_client_instance
-        mock_settings_instance = Mock()
-        mock_settings.return_value = mock_settings_instance
+        mock_settings_instance = mock_settings
 
         test_cases = [
             ("localhost", 8000, False),
@@ -91,27 +96,23 @@ class TestChromaClient:
 
     @patch('app.chromaclient.chromadb.HttpClient')
     @patch('app.chromaclient.Settings')
-    def test_get_chroma_client_settings_initialization(self, mock_settings, mock_http_client):
-        """Test that Settings is properly initialized."""
+    def test_get_chroma_client_settings_reused(self, mock_settings, mock_http_client):
+        """Test that Settings is built once at import, not per client."""
         # Arrange
-        mock_client_instance = Mock()
-        mock_http_client.return_value = mock_client_instance
-        mock_settings_instance = Mock()
-        mock_settings.return_value = mock_settings_instance
+        mock_http_client.return_value = Mock()
 
         # Act
         get_chroma_client("localhost", 8000, False)
 
         # Assert
-        mock_settings.assert_called_once_with()
+        mock_settings.assert_not_called()
+        assert mock_http_client.call_args.kwargs['settings'] is _CHROMA_SETTINGS
 
     @patch('app.chromaclient.chromadb.HttpClient')
-    @patch('app.chromaclient.Settings')
+    @patch('app.chromaclient._CHROMA_SETTINGS')
     def test_get_chroma_client_exception_handling(self, mock_settings, mock_http_client):
         """Test exception handling when client creation fails."""
         # Arrange
-        mock_settings_instance = Mock()
-        mock_settings.return_value = mock_settings_instance
         mock_http_client.side_effect = Exception("Connection failed")
 
         # Act & Assert
@@ -119,24 +120,26 @@ class TestChromaClient:
             get_chroma_client("localhost", 8000, False)
 
     @patch('app.chromaclient.chromadb.HttpClient')
-    @patch('app.chromaclient.Settings')
-    def test_get_chroma_client_settings_exception(self, mock_settings, mock_http_client):
-        """Test exception handling when Settings creation fails."""
+    @patch('app.chromaclient._CHROMA_SETTINGS')
+    def test_get_chroma_client_is_cached(self, mock_settings, mock_http_client):
+        """Test that repeated calls reuse the same client instance."""
         # Arrange
-        mock_settings.side_effect = Exception("Settings error")
+        mock_http_client.return_value = Mock()
 
-        # Act & Assert
-        with pytest.raises(Exception, match="Settings error"):
-            get_chroma_client("localhost", 8000, False)
+        # Act
+        first = get_chroma_client("localhost", 8000, False)
+        second = get_chroma_client("localhost", 8000, False)
+
+        # Assert
+        assert first is second
+        mock_http_client.assert_called_once()
 
     def test_get_chroma_client_parameter_types(self):
         """Test parameter type validation."""
         with patch('app.chromaclient.chromadb.HttpClient') as mock_http_client:
-            with patch('app.chromaclient.Settings') as mock_settings:
+            with patch('app.chromaclient._CHROMA_SETTINGS'):
                 mock_client_instance = Mock()
                 mock_http_client.return_value = mock_client_instance
-                mock_settings_instance = Mock()
-                mock_settings.return_value = mock_settings_instance
 
                 # Test with string host, int port, bool ssl
                 result = get_chroma_client("localhost", 8000, True)
@@ -149,6 +152,88 @@ class TestChromaClient:
                 assert isinstance(call_args.kwargs['ssl'], bool)
 
 
+class TestHttp2:
+    """Test cases for swapping Chroma's HTTP session to HTTP/2."""
+
+    def _fake_client(self, session):
+        server = SimpleNamespace(
+            _session=session,
+            http_limits=httpx.Limits(max_connections=10),
+            _settings=SimpleNamespace(chroma_server_ssl_verify=None),
+        )
+        return SimpleNamespace(_server=server)
+
+    def test_enable_http2_swaps_session(self):
+        """Test that the session is replaced and headers are carried over."""
+        session = httpx.Client(headers={"X-Chroma-Token": "secret"})
+        client = self._fake_client(session)
+
+        assert enable_http2(client) is True
+
+        new_session = client._server._session
+        assert new_session is not session
+        assert new_session.headers["X-Chroma-Token"] == "secret"
+        assert session.is_closed
+        new_session.close()
+
+    def test_enable_http2_unknown_layout(self):
+        """Test that clients without the expected internals are left alone."""
+        client = SimpleNamespace()
+
+        assert enable_http2(client) is False
+
+    @patch('app.chromaclient.enable_http2')
+    @patch('app.chromaclient.chromadb.HttpClient')
+    def test_get_chroma_client_http2_flag(self, mock_http_client, mock_enable_http2):
+        """Test that the http2 flag triggers the session swap."""
+        mock_client_instance = Mock()
+        mock_http_client.return_value = mock_client_instance
+
+        get_chroma_client("localhost", 8000, True, http2=True)
+
+        mock_enable_http2.assert_called_once_with(mock_client_instance)
+
+
+class TestCollectionCache:
+    """Test cases for the collection handle cache."""
+
+    def test_get_collection_cached(self):
+        """Test that collection lookups hit the client only once per name."""
+        mock_client = Mock()
+
+        first = get_collection_cached(mock_client, "docs")
+        second = get_collection_cached(mock_client, "docs")
+
+        assert first is second
+        mock_client.get_collection.assert_called_once_with("docs")
+
+    def test_get_or_create_shares_cache(self):
+        """Test that get_or_create populates the same cache as get_collection."""
+        mock_client = Mock()
+
+        created = get_or_create_collection_cached(mock_client, "docs")
+        fetched = get_collection_cached(mock_client, "docs")
+
+        assert created is fetched
+        mock_client.get_or_create_collection.assert_called_once_with("docs")
+        mock_client.get_collection.assert_not_called()
+
+    def test_clear_collection_cache(self):
+        """Test invalidating a single name and the whole cache."""
+        mock_client = Mock()
+        get_collection_cached(mock_client, "a")
+        get_collection_cached(mock_client, "b")
+
+        clear_collection_cache("a")
+        get_collection_cached(mock_client, "a")
+        get_collection_cached(mock_client, "b")
+        assert mock_client.get_collection.call_count == 3
+
+        clear_collection_cache()
+        get_collection_cached(mock_client, "b")
+        assert mock_client.get_collection.call_count == 4
+
+
 class TestChromaClientIntegration:
     """Integration-style tests for ChromaDB client."""
 
@@ -1,39 +1,49 @@
 # tests/test_config.py
 import pytest
-import os
+import runpy
 from unittest.mock import patch, mock_open
 from pydantic import ValidationError
 from app.config import Settings
 
 
+@pytest.fixture(scope="module")
+def default_settings():
+    """Settings built from defaults, shared by the tests that only read them."""
+    return Settings()
+
+
 class TestSettings:
     """Test cases for Settings configuration."""
 
-    def test_default_settings(self):
+    def test_default_settings(self, default_settings):
         """Test default configuration values."""
-        settings = Settings()
+        settings = default_settings
 
         # ChromaDB settings
         assert settings.chroma_host == " chroma-db"  # Note: there's a space in default value
         assert settings.chroma_port == 8000
         assert settings.chroma_ssl is False
+        assert settings.chroma_http2 is False
 
         # Server settings
         assert settings.server_host == "0.0.0.0"
         assert settings.server_port == 8013
-
-    def test_settings_from_env_vars(self):
+        assert settings.workers == 1
+        assert settings.dev_mode is False
+        assert settings.threadpool_size == 64
+        assert settings.add_batch_size == 250
+        assert settings.add_batch_wait_ms == 50
+        assert settings.query_batch_size == 64
+        assert settings.query_batch_wait_ms == 5
+
+    def test_settings_from_env_vars(self, monkeypatch):
         """Test settings loaded from environment variables."""
-        env_vars = {
-            "CHROMA_HOST": "custom-host",
-            "CHROMA_PORT": "9000",
-            "CHROMA_SSL": "true",
-            "SERVER_HOST": "127.0.0.1",
-            "SERVER_PORT": "8080"
-        }
-
-        with patch.dict(os.environ, env_vars):
-            settings = Settings()
+        monkeypatch.setenv("CHROMA_HOST", "custom-host")
+        monkeypatch.setenv("CHROMA_PORT", "9000")
+        monkeypatch.setenv("CHROMA_SSL", "true")
+        monkeypatch.setenv("SERVER_HOST", "127.0.0.1")
+        monkeypatch.setenv("SERVER_PORT", "8080")
+        settings = Settings()
 
         assert settings.chroma_host == "custom-host"
         assert settings.chroma_port == 9000
@@ -41,16 +51,12 @@ class TestSettings:
         assert settings.server_host == "127.0.0.1"
         assert settings.server_port == 8080
 
-    def test_settings_case_insensitive_env_vars(self):
+    def test_settings_case_insensitive_env_vars(self, monkeypatch):
         """Test that environment variables are case insensitive."""
-        env_vars = {
-            "chroma_host": "lowercase-host",
-            "CHROMA_PORT": "7000",
-            "ChRoMa_SsL": "false"
-        }
-
-        with patch.dict(os.environ, env_vars):
-            settings = Settings()
+        monkeypatch.setenv("chroma_host", "lowercase-host")
+        monkeypatch.setenv("CHROMA_PORT", "7000")
+        monkeypatch.setenv("ChRoMa_SsL", "false")
+        settings = Settings()
 
         assert settings.chroma_host == "lowercase-host"
         assert settings.chroma_port == 7000
@@ -74,151 +80,134 @@ SERVER_PORT=9090
         # handles .env file loading differently. The actual loading depends on
         # the file existing and being parseable.
 
-    def test_boolean_env_var_parsing(self):
+    @pytest.mark.parametrize("env_value,expected", [
+        ("true", True),
+        ("True", True),
+        ("TRUE", True),
+        ("1", True),
+        ("yes", True),
+        ("false", False),
+        ("False", False),
+        ("FALSE", False),
+        ("0", False),
+        ("no", False),
+    ])
+    def test_boolean_env_var_parsing(self, env_value, expected, monkeypatch):
         """Test boolean environment variable parsing."""
-        test_cases = [
-            ("true", True),
-            ("True", True),
-            ("TRUE", True),
-            ("1", True),
-            ("yes", True),
-            ("false", False),
-            ("False", False),
-            ("FALSE", False),
-            ("0", False),
-            ("no", False),
-        ]
-
-        for env_value, expected in test_cases:
-            with patch.dict(os.environ, {"CHROMA_SSL": env_value}):
-                settings = Settings()
-                assert settings.chroma_ssl == expected, f"Failed for {env_value}"
-
-    def test_integer_env_var_parsing(self):
+        monkeypatch.setenv("CHROMA_SSL", env_value)
+        assert Settings().chroma_ssl is expected
+
+    @pytest.mark.parametrize("env_var", ["CHROMA_PORT", "SERVER_PORT"])
+    @pytest.mark.parametrize("env_value,expected", [
+        ("8000", 8000),
+        ("0", 0),
+        ("65535", 65535),
+    ])
+    def test_integer_env_var_parsing(self, env_var, env_value, expected, monkeypatch):
         """Test integer environment variable parsing."""
-        test_cases = [
-            ("8000", 8000),
-            ("0", 0),
-            ("65535", 65535),
-        ]
-
-        for env_value, expected in test_cases:
-            with patch.dict(os.environ, {"CHROMA_PORT": env_value}):
-                settings = Settings()
-                assert settings.chroma_port == expected
+        monkeypatch.setenv(env_var, env_value)
+        assert getattr(Settings(), env_var.lower()) == expected
 
-            with patch.dict(os.environ, {"SERVER_PORT": env_value}):
-                settings = Settings()
-                assert settings.server_port == expected
-
-    def test_invalid_integer_env_var(self):
+    def test_invalid_integer_env_var(self, monkeypatch):
         """Test handling of invalid integer environment variables."""
-        with patch.dict(os.environ, {"CHROMA_PORT": "not_a_number"}):
-            with pytest.raises(ValidationError):
-                Settings()
+        monkeypatch.setenv("CHROMA_PORT", "not_a_number")
+        with pytest.raises(ValidationError):
+            Settings()
 
-    def test_invalid_boolean_env_var(self):
+    def test_invalid_boolean_env_var(self, monkeypatch):
         """Test handling of invalid boolean environment variables."""
-        with patch.dict(os.environ, {"CHROMA_SSL": "maybe"}):
-            with pytest.raises(ValidationError):
-                Settings()
+        monkeypatch.setenv("CHROMA_SSL", "maybe")
+        with pytest.raises(ValidationError):
+            Settings()
 
-    def test_port_range_validation(self):
+    @pytest.mark.parametrize("port", ["1", "80", "443", "8000", "65535"])
+    def test_port_range_validation(self, port, monkeypatch):
         """Test port number validation."""
-        # Test valid ports
-        valid_ports = ["1", "80", "443", "8000", "65535"]
-        for port in valid_ports:
-            with patch.dict(os.environ, {"CHROMA_PORT": port}):
-                settings = Settings()
-                assert settings.chroma_port == int(port)
+        monkeypatch.setenv("CHROMA_PORT", port)
+        assert Settings().chroma_port == int(port)
 
         # Note: pydantic doesn't automatically validate port ranges (1-65535)
         # unless explicitly configured. If you want to add this validation,
         # you would need to add a validator to the Settings class.
 
-    def test_string_field_types(self):
+    def test_string_field_types(self, monkeypatch):
         """Test string field handling."""
-        with patch.dict(os.environ, {
-            "CHROMA_HOST": "  whitespace-host  ",
-            "SERVER_HOST": "test-server"
-        }):
-            settings = Settings()
+        monkeypatch.setenv("CHROMA_HOST", "  whitespace-host  ")
+        monkeypatch.setenv("SERVER_HOST", "test-server")
+        settings = Settings()
 
         assert settings.chroma_host == "  whitespace-host  "  # pydantic preserves whitespace
         assert settings.server_host == "test-server"
 
-    def test_settings_immutability(self):
-        """Test that settings fields can be modified after creation."""
-        settings = Settings()
+    def test_settings_immutability(self, default_settings):
+        """Test that settings fields cannot be modified after creation."""
+        settings = default_settings
 
-        # pydantic models are mutable by default
-        original_host = settings.chroma_host
-        settings.chroma_host = "modified-host"
+        # Settings is frozen, since the module-level instance is shared
+        with pytest.raises(ValidationError):
+            settings.chroma_host = "modified-host"
 
-        assert settings.chroma_host == "modified-host"
-        assert settings.chroma_host != original_host
+        assert settings.chroma_host == " chroma-db"
 
-    def test_env_prefix_handling(self):
+    @pytest.mark.parametrize("env_var", ["CHROMA_HOST", "chroma_host", "Chroma_Host"])
+    def test_env_prefix_handling(self, monkeypatch, env_var):
         """Test environment variable prefix handling."""
-        # The Settings class doesn't define an env_prefix, so variables
-        # should match field names directly
-        with patch.dict(os.environ, {
-            "CHROMA_HOST": "prefixed-host",
-            "chroma_host": "lowercase-host"
-        }):
-            settings = Settings()
-
-        # The uppercase version should take precedence
+        # The Settings class doesn't define an env_prefix, so variables match
+        # field names directly; pydantic-settings matches them
+        # case-insensitively (when two spellings are set at once, whichever
+        # comes last in the environment wins, so only one is set here)
+        monkeypatch.setenv(env_var, "prefixed-host")
+        settings = Settings()
+
         assert settings.chroma_host == "prefixed-host"
 
     def test_config_class_properties(self):
-        """Test the Config class properties."""
-        settings = Settings()
-
+        """Test the model_config properties."""
         # Check that env_file is configured
-        assert hasattr(settings.__class__.Config, 'env_file')
-        assert settings.__class__.Config.env_file == ".env"
+        assert Settings.model_config["env_file"] == ".env"
+        assert Settings.model_config["frozen"] is True
 
-    def test_settings_repr(self):
+    def test_settings_repr(self, default_settings):
         """Test settings string representation."""
-        settings = Settings()
+        settings = default_settings
         repr_str = repr(settings)
 
         assert "Settings" in repr_str
         assert "chroma_host" in repr_str
         assert "chroma_port" in repr_str
 
-    def test_settings_dict_conversion(self):
+    def test_settings_dict_conversion(self, default_settings):
         """Test converting settings to dictionary."""
-        settings = Settings()
+        settings = default_settings
         settings_dict = settings.dict()
 
         expected_keys = {
-            'chroma_host', 'chroma_port', 'chroma_ssl',
-            'server_host', 'server_port'
+            'chroma_host', 'chroma_port', 'chroma_ssl', 'chroma_http2',
+            'server_host', 'server_port', 'workers', 'dev_mode',
+            'threadpool_size',
+            'add_batch_size', 'add_batch_wait_ms',
+            'query_batch_size', 'query_batch_wait_ms'
         }
 
         assert set(settings_dict.keys()) == expected_keys
         assert settings_dict['chroma_host'] == " chroma-db"
         assert settings_dict['chroma_port'] == 8000
 
-    def test_settings_json_serialization(self):
+    def test_settings_json_serialization(self, default_settings):
         """Test JSON serialization of settings."""
-        settings = Settings()
+        settings = default_settings
         json_str = settings.json()
 
         assert '"chroma_host":" chroma-db"' in json_str
         assert '"chroma_port":8000' in json_str
         assert '"chroma_ssl":false' in json_str
 
-    def test_mixed_env_and_defaults(self):
+    def test_mixed_env_and_defaults(self, monkeypatch):
         """Test mixing environment variables with defaults."""
-        with patch.dict(os.environ, {
-            "CHROMA_HOST": "env-host",
-            "SERVER_PORT": "9999"
-            # CHROMA_PORT, CHROMA_SSL, SERVER_HOST should use defaults
-        }):
-            settings = Settings()
+        # CHROMA_PORT, CHROMA_SSL, SERVER_HOST should use defaults
+        monkeypatch.setenv("CHROMA_HOST", "env-host")
+        monkeypatch.setenv("SERVER_PORT", "9999")
+        settings = Settings()
 
         assert settings.chroma_host == "env-host"  # from env
         assert settings.chroma_port == 8000  # default
@@ -238,28 +227,33 @@ class TestSettingsIntegration:
         # They should be the same instance
         assert settings1 is settings2
 
-    def test_settings_usage_in_chromaclient(self):
-        """Test settings integration with chromaclient dependency."""
-        with patch.dict(os.environ, {
-            "CHROMA_HOST": "test-integration-host",
-            "CHROMA_PORT": "8001",
-            "CHROMA_SSL": "true"
-        }):
-            from app.config import Settings
-            settings = Settings()
-
-            assert settings.chroma_host == "test-integration-host"
-            assert settings.chroma_port == 8001
-            assert settings.chroma_ssl is True
-
-    def test_settings_usage_in_main(self):
-        """Test settings integration with main app."""
-        with patch.dict(os.environ, {
-            "SERVER_HOST": "test-server-host",
-            "SERVER_PORT": "8014"
-        }):
-            from app.config import Settings
-            settings = Settings()
-
-            assert settings.server_host == "test-server-host"
-            assert settings.server_port == 8014
\ No newline at end of file
+    def test_settings_usage_in_chromaclient(self, monkeypatch, real_get_client):
+        """Test that the Chroma client is built from the configured settings."""
+        monkeypatch.setenv("CHROMA_HOST", "test-integration-host")
+        monkeypatch.setenv("CHROMA_PORT", "8001")
+        monkeypatch.setenv("CHROMA_SSL", "true")
+
+        # app.routes bound the shared instance at import, so patch it there
+        with patch('app.routes.settings', Settings()), \
+                patch('app.chromaclient.chromadb.HttpClient') as mock_http_client:
+            real_get_client()
+
+        kwargs = mock_http_client.call_args.kwargs
+        assert kwargs["host"] == "test-integration-host"
+        assert kwargs["port"] == 8001
+        assert kwargs["ssl"] is True
+
+    # runpy warns that app.main is already imported; re-executing it is the point
+    @pytest.mark.filterwarnings("ignore:.*found in sys.modules:RuntimeWarning")
+    def test_settings_usage_in_main(self, monkeypatch):
+        """Test that the module entrypoint serves on the configured address."""
+        monkeypatch.setenv("SERVER_HOST", "test-server-host")
+        monkeypatch.setenv("SERVER_PORT", "8014")
+
+        with patch('app.config.settings', Settings()), \
+                patch('uvicorn.run') as mock_run:
+            runpy.run_module('app.main', run_name='__main__')
+
+        kwargs = mock_run.call_args.kwargs
+        assert kwargs["host"] == "test-server-host"
+        assert kwargs["port"] == 8014
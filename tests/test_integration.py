@@ -1,43 +1,61 @@
 # tests/test_integration.py
+import asyncio
+import orjson
 import pytest
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
-from fastapi.testclient import TestClient
-from app.main import app
+from tests.helpers import post_json
 
+_TOOL_CALL_TEMPLATE = {"jsonrpc": "2.0", "method": "tools/call"}
 
-class TestFullIntegration:
-    """End-to-end integration tests for the MCP ChromaDB server."""
+_INITIALIZE_REQUEST = {"jsonrpc": "2.0", "id": 1, "method": "initialize"}
+_INITIALIZED_REQUEST = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+_TOOLS_LIST_REQUEST = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+
+def _tool_call(request_id, name, arguments):
+    """Build a tools/call request from the shared envelope template."""
+    return {
+        **_TOOL_CALL_TEMPLATE,
+        "id": request_id,
+        "params": {"name": name, "arguments": arguments},
+    }
+
+
+class _Recorder:
+    """Callable stand-in that records its calls and returns a preset value."""
 
-    @pytest.fixture
-    def client(self):
-        """Create test client."""
-        return TestClient(app)
+    def __init__(self, return_value=None):
+        self.return_value = return_value
+        self.calls = []
 
-    @pytest.fixture
-    def mock_chroma_client(self):
-        """Mock ChromaDB client with realistic behavior."""
-        client = Mock()
-        collection = Mock()
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.return_value
 
-        # Setup default collection behavior
-        client.get_collection.return_value = collection
-        client.get_or_create_collection.return_value = collection
 
-        return client, collection
+def _stub_collection(query_result=None):
+    """Plain collection double, much cheaper to build and call than a Mock."""
+    return SimpleNamespace(query=_Recorder(query_result), add=_Recorder())
+
+
+def _stub_client(collections):
+    """Client double that serves collections from a dict by name."""
+    return SimpleNamespace(
+        get_collection=collections.__getitem__,
+        get_or_create_collection=lambda name: collections.get(name) or _stub_collection(),
+    )
+
+
+class TestFullIntegration:
+    """End-to-end integration tests for the MCP ChromaDB server."""
 
-    def test_complete_mcp_workflow(self, client, mock_chroma_client):
+    def test_complete_mcp_workflow(self, client, patch_get_client):
         """Test complete MCP workflow: initialize, list tools, query, add."""
-        mock_client, mock_collection = mock_chroma_client
+        mock_client, mock_collection = patch_get_client
 
         # Step 1: Initialize
-        initialize_request = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "initialize"
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=initialize_request)
+        response = post_json(client, "/mcp", _INITIALIZE_REQUEST)
 
         assert response.status_code == 200
         data = response.json()
@@ -45,26 +63,13 @@ class TestFullIntegration:
         assert data["result"]["serverInfo"]["name"] == "chroma-mcp-http-server"
 
         # Step 2: Send initialized notification
-        initialized_request = {
-            "jsonrpc": "2.0",
-            "method": "notifications/initialized"
-        }
+        response = post_json(client, "/mcp", _INITIALIZED_REQUEST)
 
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=initialized_request)
-
-        assert response.status_code == 200
-        assert response.json() == {}
+        assert response.status_code == 202
+        assert response.content == b""
 
         # Step 3: List tools
-        list_tools_request = {
-            "jsonrpc": "2.0",
-            "id": 2,
-            "method": "tools/list"
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=list_tools_request)
+        response = post_json(client, "/mcp", _TOOLS_LIST_REQUEST)
 
         assert response.status_code == 200
         data = response.json()
@@ -76,23 +81,14 @@ class TestFullIntegration:
 
         # Step 4: Add documents
         mock_collection.reset_mock()  # Reset mock calls
-        add_request = {
-            "jsonrpc": "2.0",
-            "id": 3,
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.add_texts",
-                "arguments": {
-                    "collection": "test_docs",
-                    "ids": ["doc1", "doc2"],
-                    "documents": ["First document", "Second document"],
-                    "metadatas": [{"type": "test"}, {"type": "test"}]
-                }
-            }
-        }
+        add_request = _tool_call(3, "chroma.add_texts", {
+            "collection": "test_docs",
+            "ids": ["doc1", "doc2"],
+            "documents": ["First document", "Second document"],
+            "metadatas": [{"type": "test"}, {"type": "test"}],
+        })
 
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=add_request)
+        response = client.post("/mcp", json=add_request)
 
         assert response.status_code == 200
         assert response.json()["result"] == "ok"
@@ -115,135 +111,84 @@ class TestFullIntegration:
         }
         mock_collection.query.return_value = mock_query_result
 
-        query_request = {
-            "jsonrpc": "2.0",
-            "id": 4,
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_docs",
-                    "query_texts": ["test query"],
-                    "n_results": 2
-                }
-            }
-        }
+        query_request = _tool_call(4, "chroma.query", {
+            "collection": "test_docs",
+            "query_texts": ["test query"],
+            "n_results": 2,
+        })
 
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=query_request)
+        response = client.post("/mcp", json=query_request)
 
         assert response.status_code == 200
         data = response.json()
         assert data["result"] == mock_query_result
 
-        # Verify query was called correctly
-        mock_client.get_collection.assert_called_once_with("test_docs")
+        # Verify query was called correctly; the handle cached by the add is reused
+        mock_client.get_collection.assert_not_called()
         mock_collection.query.assert_called_once_with(
             query_texts=["test query"],
             n_results=2
         )
 
-    def test_error_handling_workflow(self, client, mock_chroma_client):
+    def test_error_handling_workflow(self, client, patch_get_client):
         """Test error handling in complete workflow."""
-        mock_client, mock_collection = mock_chroma_client
+        mock_client, mock_collection = patch_get_client
 
         # Test ChromaDB connection error
         mock_client.get_collection.side_effect = Exception("ChromaDB connection failed")
 
-        query_request = {
-            "jsonrpc": "2.0",
-            "id": "error-test",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection",
-                    "query_texts": ["test query"]
-                }
-            }
-        }
+        query_request = _tool_call("error-test", "chroma.query", {
+            "collection": "test_collection",
+            "query_texts": ["test query"],
+        })
 
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=query_request)
+        response = client.post("/mcp", json=query_request)
 
         assert response.status_code == 500
 
-    def test_multiple_collections_workflow(self, client, mock_chroma_client):
+    def test_multiple_collections_workflow(self, client):
         """Test workflow with multiple collections."""
-        mock_client, _ = mock_chroma_client
-
-        # Create different mock collections
-        collection1 = Mock()
-        collection2 = Mock()
-
-        def mock_get_collection(name):
-            if name == "collection1":
-                return collection1
-            elif name == "collection2":
-                return collection2
-            raise ValueError(f"Collection {name} not found")
-
-        def mock_get_or_create_collection(name):
-            if name == "collection1":
-                return collection1
-            elif name == "collection2":
-                return collection2
-            # Create new mock for new collections
-            return Mock()
-
-        mock_client.get_collection.side_effect = mock_get_collection
-        mock_client.get_or_create_collection.side_effect = mock_get_or_create_collection
+        collection1 = _stub_collection()
+        collection2 = _stub_collection(
+            {"ids": [["doc2"]], "documents": [["Doc from collection2"]], "metadatas": [[]], "distances": [[0.0]]}
+        )
+        stub_client = _stub_client({"collection1": collection1, "collection2": collection2})
 
         # Add to collection1
-        add_request1 = {
-            "jsonrpc": "2.0",
-            "id": "add1",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.add_texts",
-                "arguments": {
-                    "collection": "collection1",
-                    "ids": ["doc1"],
-                    "documents": ["Document in collection1"]
-                }
-            }
-        }
+        add_request1 = _tool_call("add1", "chroma.add_texts", {
+            "collection": "collection1",
+            "ids": ["doc1"],
+            "documents": ["Document in collection1"],
+        })
 
-        with patch('app.routes.get_client', return_value=mock_client):
+        with patch('app.routes.get_client', return_value=stub_client):
             response = client.post("/mcp", json=add_request1)
 
         assert response.status_code == 200
-        collection1.add.assert_called_once()
+        assert len(collection1.add.calls) == 1
 
         # Query from collection2
-        collection2.query.return_value = {"ids": [["doc2"]], "documents": [["Doc from collection2"]], "metadatas": [[]], "distances": [[0.0]]}
-        query_request2 = {
-            "jsonrpc": "2.0",
-            "id": "query2",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "collection2",
-                    "query_texts": ["query for collection2"]
-                }
-            }
-        }
+        query_request2 = _tool_call("query2", "chroma.query", {
+            "collection": "collection2",
+            "query_texts": ["query for collection2"],
+        })
 
-        with patch('app.routes.get_client', return_value=mock_client):
+        with patch('app.routes.get_client', return_value=stub_client):
             response = client.post("/mcp", json=query_request2)
 
         assert response.status_code == 200
-        collection2.query.assert_called_once()
+        assert len(collection2.query.calls) == 1
 
-    def test_configuration_integration(self, client):
+    def test_configuration_integration(self, client, real_get_client):
         """Test that configuration is properly integrated."""
         with patch.dict('os.environ', {
             'CHROMA_HOST': 'test-host',
             'CHROMA_PORT': '9000',
             'CHROMA_SSL': 'true'
         }):
-            with patch('app.routes.get_chroma_client') as mock_get_client:
+            # Restore the real accessor so the (uncached) factory is reached
+            with patch('app.routes.get_client', real_get_client), \
+                    patch('app.routes.get_chroma_client') as mock_get_client:
                 mock_client = Mock()
                 mock_collection = Mock()
                 mock_client.get_collection.return_value = mock_collection
@@ -255,18 +200,10 @@ class TestFullIntegration:
                 }
                 mock_get_client.return_value = mock_client
 
-                request = {
-                    "jsonrpc": "2.0",
-                    "id": "config-test",
-                    "method": "tools/call",
-                    "params": {
-                        "name": "chroma.query",
-                        "arguments": {
-                            "collection": "test",
-                            "query_texts": ["test"]
-                        }
-                    }
-                }
+                request = _tool_call("config-test", "chroma.query", {
+                    "collection": "test",
+                    "query_texts": ["test"],
+                })
 
                 response = client.post("/mcp", json=request)
                 assert response.status_code == 200
@@ -274,36 +211,28 @@ class TestFullIntegration:
                 # Verify that get_chroma_client was called with environment values
                 mock_get_client.assert_called()
 
-    def test_concurrent_requests(self, client, mock_chroma_client):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_concurrent_requests(self, test_client):
         """Test handling of concurrent requests."""
-        mock_client, mock_collection = mock_chroma_client
-        mock_collection.query.return_value = {
+        collection = _stub_collection({
             "ids": [["doc1"]],
             "documents": [["test doc"]],
             "metadatas": [[]],
             "distances": [[0.0]]
-        }
+        })
+        stub_client = _stub_client({f"collection_{i}": collection for i in range(5)})
 
         requests = []
         for i in range(5):
-            requests.append({
-                "jsonrpc": "2.0",
-                "id": f"concurrent-{i}",
-                "method": "tools/call",
-                "params": {
-                    "name": "chroma.query",
-                    "arguments": {
-                        "collection": f"collection_{i}",
-                        "query_texts": [f"query {i}"]
-                    }
-                }
-            })
+            requests.append(_tool_call(f"concurrent-{i}", "chroma.query", {
+                "collection": f"collection_{i}",
+                "query_texts": [f"query {i}"],
+            }))
 
-        responses = []
-        with patch('app.routes.get_client', return_value=mock_client):
-            for request in requests:
-                response = client.post("/mcp", json=request)
-                responses.append(response)
+        with patch('app.routes.get_client', return_value=stub_client):
+            responses = await asyncio.gather(*(
+                test_client.post("/mcp", json=request) for request in requests
+            ))
 
         # All requests should succeed
         for i, response in enumerate(responses):
@@ -316,33 +245,81 @@ class TestFullIntegration:
         response = client.post("/mcp", data="invalid json")
         assert response.status_code == 422
 
-    def test_missing_required_fields(self, client):
+    @pytest.mark.parametrize("payload", [
+        {},  # Missing method
+        {"method": "tools/call"},  # Missing params for tools/call
+        {"method": "tools/call", "params": {}},  # Missing name in params
+        {"method": "tools/call", "params": {"name": "chroma.query"}},  # Missing arguments
+    ], ids=["no-method", "no-params", "no-name", "no-arguments"])
+    def test_missing_required_fields(self, client, payload):
         """Test handling of requests with missing required fields."""
-        invalid_requests = [
-            {},  # Missing method
-            {"method": "tools/call"},  # Missing params for tools/call
-            {"method": "tools/call", "params": {}},  # Missing name in params
-            {"method": "tools/call", "params": {"name": "chroma.query"}},  # Missing arguments
-        ]
-
-        for request in invalid_requests:
-            request.setdefault("jsonrpc", "2.0")
-            with patch('app.routes.get_client'):
-                response = client.post("/mcp", json=request)
-                # Should either be validation error (422) or method not found (200 with error)
-                assert response.status_code in [200, 422]
+        response = client.post("/mcp", json={"jsonrpc": "2.0", **payload})
 
-    def test_health_check_simulation(self, client):
+        # Should either be validation error (422) or method not found (200 with error)
+        assert response.status_code in [200, 422]
+
+    def test_health_check_simulation(self):
         """Test basic health check by calling initialize."""
-        request = {
-            "jsonrpc": "2.0",
-            "id": "health",
-            "method": "initialize"
-        }
+        from app.mcp_models import MCPRequest
+        from app.routes import dispatch
 
-        with patch('app.routes.get_client'):
-            response = client.post("/mcp", json=request)
+        # No wire-level concerns here, so skip the ASGI round trip
+        request = MCPRequest(jsonrpc="2.0", id="health", method="initialize")
+        response = asyncio.run(dispatch(request))
 
         assert response.status_code == 200
-        data = response.json()
-        assert data["result"]["serverInfo"]["name"] == "chroma-mcp-http-server"
\ No newline at end of file
+        data = orjson.loads(response.body)
+        assert data["result"]["serverInfo"]["name"] == "chroma-mcp-http-server"
+
+
+class TestAsyncIntegration:
+    """End-to-end tests that issue requests concurrently on one event loop."""
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_concurrent_queries_share_one_chroma_call(self, test_client, patch_get_client):
+        """Test that concurrent single-text queries are batched into one call."""
+        _, mock_collection = patch_get_client
+        mock_collection.query.return_value = {
+            "ids": [[f"doc{i}"] for i in range(5)],
+            "documents": [[f"Document {i}"] for i in range(5)],
+            "metadatas": [[{}] for _ in range(5)],
+            "distances": [[0.1 * i] for i in range(5)],
+        }
+
+        responses = await asyncio.gather(*(
+            test_client.post("/mcp", json=_tool_call(i, "chroma.query", {
+                "collection": "shared",
+                "query_texts": [f"query {i}"],
+                "n_results": 1,
+            }))
+            for i in range(5)
+        ))
+
+        mock_collection.query.assert_called_once()
+        assert mock_collection.query.call_args.kwargs["n_results"] == 1
+        assert len(mock_collection.query.call_args.kwargs["query_texts"]) == 5
+        texts = mock_collection.query.call_args.kwargs["query_texts"]
+        for response in responses:
+            assert response.status_code == 200
+            data = response.json()
+            # Each caller gets the row that belongs to its own query text
+            row = texts.index(f"query {data['id']}")
+            assert data["result"]["ids"] == [[f"doc{row}"]]
+
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_concurrent_adds_share_one_chroma_call(self, test_client, patch_get_client):
+        """Test that concurrent adds to one collection are batched into one write."""
+        _, mock_collection = patch_get_client
+
+        responses = await asyncio.gather(*(
+            test_client.post("/mcp", json=_tool_call(i, "chroma.add_texts", {
+                "collection": "shared",
+                "ids": [f"doc{i}"],
+                "documents": [f"Document {i}"],
+            }))
+            for i in range(3)
+        ))
+
+        assert all(r.status_code == 200 for r in responses)
+        mock_collection.add.assert_called_once()
+        assert sorted(mock_collection.add.call_args.kwargs["ids"]) == ["doc0", "doc1", "doc2"]
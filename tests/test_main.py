@@ -1,124 +1,167 @@
 # tests/test_main.py
+import asyncio
+import orjson
+import runpy
 import pytest
 from unittest.mock import patch
 from fastapi.testclient import TestClient
-from app.main import app
+from app.responses import ORJSONResponse
+from app.routes import _MCP_OPENAPI, router
+from tests.helpers import post_json
+
+_INITIALIZE_REQUEST = {"jsonrpc": "2.0", "id": "health", "method": "initialize"}
+_QUERY_REQUEST = {
+    "jsonrpc": "2.0",
+    "id": "warm",
+    "method": "tools/call",
+    "params": {
+        "name": "chroma.query",
+        "arguments": {"collection": "docs", "query_texts": ["query"]},
+    },
+}
+
+
+@pytest.fixture(scope="module")
+def openapi_schema(client):
+    """Fetch and decode the OpenAPI schema once for the module."""
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    return orjson.loads(response.content)
 
 
 class TestMainApp:
     """Test cases for the main FastAPI application."""
 
-    @pytest.fixture
-    def client(self):
-        """Create test client."""
-        return TestClient(app)
-
-    def test_app_creation(self):
+    def test_app_creation(self, app):
         """Test that the FastAPI app is created correctly."""
         assert app.title == "Chroma MCP HTTP/SSE Server"
         assert app is not None
 
+    def test_default_response_class(self, app):
+        """Test that responses are encoded with orjson by default."""
+        response_class = app.router.default_response_class
+        # FastAPI may wrap the class in a DefaultPlaceholder
+        assert getattr(response_class, "value", response_class) is ORJSONResponse
+
     def test_router_inclusion(self, client):
         """Test that the router is properly included."""
         # Test that MCP endpoints are available
-        with patch('app.routes.get_client'):
-            response = client.post("/mcp", json={
-                "jsonrpc": "2.0",
-                "id": "test",
-                "method": "initialize"
-            })
+        response = post_json(client, "/mcp", _INITIALIZE_REQUEST)
 
         assert response.status_code == 200
 
         # Test alternative endpoint
-        with patch('app.routes.get_client'):
-            response = client.post("/", json={
-                "jsonrpc": "2.0",
-                "id": "test",
-                "method": "initialize"
-            })
+        response = post_json(client, "/", _INITIALIZE_REQUEST)
 
         assert response.status_code == 200
 
-    def test_app_startup(self):
-        """Test basic app functionality."""
-        with TestClient(app) as test_client:
-            # App should start without errors
-            assert test_client is not None
-
-    @patch('app.main.uvicorn.run')
-    @patch('app.main.settings')
-    def test_main_execution(self, mock_settings, mock_uvicorn_run):
-        """Test the main execution block."""
-        # Setup mock settings
+    def test_startup_warms_client(self, app, real_get_client):
+        """Test that the client built at startup is reused by the first tool call."""
+        with patch('app.chromaclient.chromadb.HttpClient') as mock_http_client, \
+                patch('app.main.get_client', real_get_client), \
+                patch('app.routes.get_client', real_get_client):
+            collection = mock_http_client.return_value.get_collection.return_value
+            collection.query.return_value = {"ids": [["doc1"]]}
+
+            with TestClient(app) as test_client:
+                mock_http_client.assert_called_once()
+                response = post_json(test_client, "/mcp", _QUERY_REQUEST)
+
+        assert response.status_code == 200
+        mock_http_client.assert_called_once()
+
+    def test_startup_without_chroma(self, app):
+        """Test that the app still starts when Chroma is unreachable."""
+        with patch('app.main.get_client', side_effect=Exception("Connection refused")):
+            with TestClient(app) as test_client:
+                response = post_json(test_client, "/", _INITIALIZE_REQUEST)
+                assert response.status_code == 200
+
+    # runpy warns that app.main is already imported; re-executing it is the point
+    @pytest.mark.filterwarnings("ignore:.*found in sys.modules:RuntimeWarning")
+    @patch('uvicorn.run')
+    def test_main_execution(self, mock_run, mock_settings):
+        """Test that running the module starts uvicorn with the production options."""
+        mock_settings.server_host = "test-host"
+        mock_settings.server_port = 9999
+        mock_settings.workers = 4
+
+        # Executes the real `if __name__ == "__main__"` block, as python -m app.main does
+        with patch('app.config.settings', mock_settings):
+            runpy.run_module('app.main', run_name='__main__')
+
+        mock_run.assert_called_once_with(
+            "app.main:app",
+            host="test-host",
+            port=9999,
+            workers=4,
+        )
+
+    @pytest.mark.filterwarnings("ignore:.*found in sys.modules:RuntimeWarning")
+    @patch('uvicorn.run')
+    def test_main_execution_dev_mode(self, mock_run, mock_settings):
+        """Test that dev mode runs a single reloading worker."""
         mock_settings.server_host = "test-host"
         mock_settings.server_port = 9999
+        mock_settings.dev_mode = True
 
-        # Import and execute the main block
-        # This simulates running: python -m app.main
-        import app.main
-
-        # Since the main block only runs when __name__ == "__main__",
-        # we need to test it differently
-        if hasattr(app.main, '__name__'):
-            # Simulate main execution
-            import uvicorn
-            with patch.object(uvicorn, 'run') as mock_run:
-                # This would be called if running as main
-                uvicorn.run(
-                    "app.main:app",
-                    host=mock_settings.server_host,
-                    port=mock_settings.server_port,
-                    reload=True,
-                )
-
-                mock_run.assert_called_once_with(
-                    "app.main:app",
-                    host=mock_settings.server_host,
-                    port=mock_settings.server_port,
-                    reload=True,
-                )
-
-    def test_openapi_schema(self, client):
-        """Test that OpenAPI schema is generated correctly."""
-        response = client.get("/openapi.json")
-        assert response.status_code == 200
+        with patch('app.config.settings', mock_settings):
+            runpy.run_module('app.main', run_name='__main__')
 
-        schema = response.json()
-        assert schema["info"]["title"] == "Chroma MCP HTTP/SSE Server"
-        assert "paths" in schema
+        mock_run.assert_called_once_with(
+            "app.main:app",
+            host="test-host",
+            port=9999,
+            reload=True,
+        )
 
+    @pytest.mark.slow
+    def test_openapi_schema(self, openapi_schema):
+        """Test that OpenAPI schema is generated correctly."""
+        assert openapi_schema["info"]["title"] == "Chroma MCP HTTP/SSE Server"
+        assert "paths" in openapi_schema
+
+    def test_openapi_request_body(self):
+        """Test that the raw-body MCP endpoint still documents its payload."""
+        # Checked on the routes' openapi_extra, so the full schema isn't built
+        schema = _MCP_OPENAPI["requestBody"]["content"]["application/json"]["schema"]
+        assert schema["required"] == ["method"]
+        assert {route.path for route in router.routes
+                if route.openapi_extra is _MCP_OPENAPI} == {"/", "/mcp"}
+
+    @pytest.mark.slow
     def test_docs_endpoint(self, client):
         """Test that docs endpoint is available."""
         response = client.get("/docs")
         assert response.status_code == 200
         assert "text/html" in response.headers["content-type"]
 
+    @pytest.mark.slow
     def test_redoc_endpoint(self, client):
         """Test that redoc endpoint is available."""
         response = client.get("/redoc")
         assert response.status_code == 200
         assert "text/html" in response.headers["content-type"]
 
-    def test_health_check_via_root(self, client):
-        """Test basic health check via root endpoint."""
-        # Since there's no dedicated health endpoint, we test via initialize
-        with patch('app.routes.get_client'):
-            response = client.post("/", json={
-                "jsonrpc": "2.0",
-                "id": "health",
-                "method": "initialize"
-            })
+    def test_health_check_via_root(self):
+        """Test basic health check via the root endpoint's handler."""
+        from app.mcp_models import MCPRequest
+        from app.routes import dispatch
+
+        # Since there's no dedicated health endpoint, we test via initialize;
+        # test_router_inclusion already covers the route itself
+        request = MCPRequest(jsonrpc="2.0", id="health", method="initialize")
+        response = asyncio.run(dispatch(request))
 
         assert response.status_code == 200
-        data = response.json()
+        data = orjson.loads(response.body)
         assert data["result"]["serverInfo"]["name"] == "chroma-mcp-http-server"
 
 
 class TestAppConfiguration:
     """Test application configuration and setup."""
 
-    def test_app_debug_mode(self):
+    def test_app_debug_mode(self, app):
         """Test app in different modes."""
         # In test mode, debug should be handled appropriately
         assert app is not None
@@ -1,13 +1,16 @@
 # tests/test_mcp_models.py
 import pytest
 from pydantic import ValidationError
+from pydantic_core import SchemaSerializer, SchemaValidator
 from app.mcp_models import MCPQueryParams, MCPAddTextsParams, MCPRequest
 
+pytestmark = pytest.mark.xdist_group(name="models")
+
 
 class TestMCPQueryParams:
     """Test cases for MCPQueryParams model."""
 
-    def test_valid_query_params(self):
+    def test_validMCPQueryParams(self):
         """Test valid query parameters."""
         params = MCPQueryParams(
             collection="test_collection",
@@ -18,14 +21,6 @@ class TestMCPQueryParams:
         assert params.query_texts == ["query text 1", "query text 2"]
         assert params.n_results == 10
 
-    def test_default_n_results(self):
-        """Test default value for n_results."""
-        params = MCPQueryParams(
-            collection="test_collection",
-            query_texts=["query text"]
-        )
-        assert params.n_results == 5
-
     def test_missing_required_fields(self):
         """Test validation error when required fields are missing."""
         with pytest.raises(ValidationError) as exc_info:
@@ -37,7 +32,7 @@ class TestMCPQueryParams:
         assert "query_texts" in error_fields
 
     def test_empty_query_texts(self):
-        """Test validation with empty query_texts list."""
+        """Test that an empty query_texts list is kept as-is."""
         params = MCPQueryParams(
             collection="test_collection",
             query_texts=[]
@@ -52,6 +47,12 @@ class TestMCPQueryParams:
                 query_texts="not a list"  # Should be list
             )
 
+    def test_query_params_are_frozen(self):
+        """Test that MCPQueryParams instances are immutable."""
+        params = MCPQueryParams(collection="c", query_texts=["q"])
+        with pytest.raises(ValidationError):
+            params.collection = "x"
+
 
 class TestMCPAddTextsParams:
     """Test cases for MCPAddTextsParams model."""
@@ -69,15 +70,6 @@ class TestMCPAddTextsParams:
         assert params.documents == ["doc1", "doc2"]
         assert params.metadatas == [{"key": "value"}, {"key2": "value2"}]
 
-    def test_optional_metadatas(self):
-        """Test that metadatas is optional."""
-        params = MCPAddTextsParams(
-            collection="test_collection",
-            ids=["id1"],
-            documents=["doc1"]
-        )
-        assert params.metadatas is None
-
     def test_missing_required_fields(self):
         """Test validation error when required fields are missing."""
         with pytest.raises(ValidationError) as exc_info:
@@ -109,11 +101,17 @@ class TestMCPAddTextsParams:
         assert params.ids == []
         assert params.documents == []
 
+    def test_add_texts_params_are_frozen(self):
+        """Test that MCPAddTextsParams instances are immutable."""
+        params = MCPAddTextsParams(collection="c", ids=["id1"], documents=["doc1"])
+        with pytest.raises(ValidationError):
+            params.ids = ["id2"]
+
 
 class TestMCPRequest:
     """Test cases for MCPRequest model."""
 
-    def test_valid_request(self):
+    def test_validMCPRequest(self):
         """Test valid MCP request."""
         request = MCPRequest(
             jsonrpc="2.0",
@@ -126,30 +124,10 @@ class TestMCPRequest:
         assert request.method == "initialize"
         assert request.params == {"test": "value"}
 
-    def test_default_jsonrpc(self):
-        """Test default jsonrpc value."""
-        request = MCPRequest(method="test")
-        assert request.jsonrpc == "2.0"
-
-    def test_optional_fields(self):
-        """Test optional fields."""
-        request = MCPRequest(method="test")
-        assert request.id is None
-        assert request.params is None
-
-    def test_id_types(self):
+    @pytest.mark.parametrize("id_value", ["string-id", 123, None])
+    def test_id_types(self, id_value):
         """Test different ID types."""
-        # String ID
-        request1 = MCPRequest(method="test", id="string-id")
-        assert request1.id == "string-id"
-
-        # Integer ID
-        request2 = MCPRequest(method="test", id=123)
-        assert request2.id == 123
-
-        # None ID
-        request3 = MCPRequest(method="test", id=None)
-        assert request3.id is None
+        assert MCPRequest(method="test", id=id_value).id == id_value
 
     def test_missing_method(self):
         """Test validation error when method is missing."""
@@ -166,11 +144,50 @@ class TestMCPRequest:
         request = MCPRequest(jsonrpc="1.0", method="test")
         assert request.jsonrpc == "1.0"
 
+    def test_request_is_frozen(self):
+        """Test that MCPRequest instances are immutable."""
+        request = MCPRequest(method="test")
+        with pytest.raises(ValidationError):
+            request.method = "other"
+
+    def test_extra_fields_ignored(self):
+        """Test that unknown envelope fields are dropped."""
+        request = MCPRequest(method="test", unknown="value")
+        assert not hasattr(request, "unknown")
+
+
+_DEFAULTS = [
+    pytest.param(MCPQueryParams, {"collection": "c", "query_texts": ["q"]}, "n_results", 5,
+                 id="query-n_results"),
+    pytest.param(MCPAddTextsParams, {"collection": "c", "ids": ["i"], "documents": ["d"]},
+                 "metadatas", None, id="add_texts-metadatas"),
+    pytest.param(MCPRequest, {"method": "t"}, "jsonrpc", "2.0", id="request-jsonrpc"),
+    pytest.param(MCPRequest, {"method": "t"}, "id", None, id="request-id"),
+    pytest.param(MCPRequest, {"method": "t"}, "params", None, id="request-params"),
+]
+
+
+class TestModelDefaults:
+    """Test the default values of optional fields."""
+
+    @pytest.mark.parametrize("model_cls,kwargs,attr,expected", _DEFAULTS)
+    def test_field_defaults(self, model_cls, kwargs, attr, expected):
+        """Test that an omitted optional field takes its default."""
+        assert getattr(model_cls(**kwargs), attr) == expected
+
 
 class TestModelIntegration:
     """Integration tests for model interactions."""
 
-    def test_query_params_in_mcp_request(self):
+    @pytest.mark.parametrize("model", [MCPQueryParams, MCPAddTextsParams, MCPRequest])
+    def test_schema_built_at_import(self, model):
+        """Test that validators are built with the class, not on first use."""
+        # Deferred building would move the schema cost onto the first request
+        assert model.__pydantic_complete__
+        assert isinstance(model.__pydantic_validator__, SchemaValidator)
+        assert isinstance(model.__pydantic_serializer__, SchemaSerializer)
+
+    def test_query_params_in_mcpMCPRequest(self):
         """Test using query params in MCP request."""
         query_params = {
             "collection": "test_collection",
@@ -194,7 +211,7 @@ class TestModelIntegration:
         assert validated_params.query_texts == ["test query"]
         assert validated_params.n_results == 3
 
-    def test_add_texts_params_in_mcp_request(self):
+    def test_add_texts_params_in_mcpMCPRequest(self):
         """Test using add texts params in MCP request."""
         add_params = {
             "collection": "test_collection",
@@ -1,379 +1,230 @@
 # tests/test_query.py
+import orjson
 import pytest
-from unittest.mock import Mock, patch
-from fastapi.testclient import TestClient
-from app.main import app
-
-
-class TestQuerySpecific:
-    """Specific tests for query functionality."""
-
-    @pytest.fixture
-    def client(self):
-        """Create test client."""
-        return TestClient(app)
-
-    @pytest.fixture
-    def mock_chroma_setup(self):
-        """Setup mock ChromaDB client with query-specific behavior."""
-        mock_client = Mock()
-        mock_collection = Mock()
-        mock_client.get_collection.return_value = mock_collection
-        return mock_client, mock_collection
-
-    def test_basic_query(self, client, mock_chroma_setup):
-        """Test basic query functionality."""
-        mock_client, mock_collection = mock_chroma_setup
-
-        # Setup mock response
-        mock_query_result = {
+from unittest.mock import call
+from app.mcp_models import MCPRequest
+from tests.helpers import JSON_HEADERS, post_json, read_json
+
+# The shared async client lives on the session event loop
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+# Shared Chroma results; read-only, so built once rather than per test
+_EMPTY_RESULT = {
+    "ids": [[]],
+    "documents": [[]],
+    "metadatas": [[]],
+    "distances": [[]]
+}
+
+_SINGLE_RESULT = {
+    "ids": [["doc1"]],
+    "documents": [["Test document"]],
+    "metadatas": [[{"test": "metadata"}]],
+    "distances": [[0.1]]
+}
+
+# (collection, query_texts, n_results sent, expected Chroma call, Chroma result)
+_QUERY_CASES = [
+    pytest.param(
+        "documents", ["search term"], 3,
+        call(query_texts=["search term"], n_results=3),
+        {
             "ids": [["doc1", "doc2", "doc3"]],
             "documents": [["First document", "Second document", "Third document"]],
             "metadatas": [[{"author": "Alice"}, {"author": "Bob"}, {"author": "Charlie"}]],
             "distances": [[0.1, 0.3, 0.5]]
-        }
-        mock_collection.query.return_value = mock_query_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "basic-query",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "documents",
-                    "query_texts": ["search term"],
-                    "n_results": 3
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
-
-        assert response.status_code == 200
-        data = response.json()
-        assert data["result"] == mock_query_result
-
-        # Verify ChromaDB method calls
-        mock_client.get_collection.assert_called_once_with("documents")
-        mock_collection.query.assert_called_once_with(
-            query_texts=["search term"],
-            n_results=3
-        )
-
-    def test_multiple_query_texts(self, client, mock_chroma_setup):
-        """Test query with multiple query texts."""
-        mock_client, mock_collection = mock_chroma_setup
-
-        mock_query_result = {
+        },
+        id="basic",
+    ),
+    pytest.param(
+        "documents", ["first query", "second query"], 2,
+        call(query_texts=["first query", "second query"], n_results=2),
+        {
             "ids": [["doc1", "doc2"], ["doc3", "doc4"]],
             "documents": [["Doc 1", "Doc 2"], ["Doc 3", "Doc 4"]],
             "metadatas": [[{}, {}], [{}, {}]],
             "distances": [[0.1, 0.2], [0.3, 0.4]]
-        }
-        mock_collection.query.return_value = mock_query_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "multi-query",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "documents",
-                    "query_texts": ["first query", "second query"],
-                    "n_results": 2
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
-
-        assert response.status_code == 200
-        mock_collection.query.assert_called_once_with(
-            query_texts=["first query", "second query"],
-            n_results=2
-        )
-
-    def test_default_n_results(self, client, mock_chroma_setup):
-        """Test query with default n_results value."""
-        mock_client, mock_collection = mock_chroma_setup
-
-        mock_query_result = {
+        },
+        id="multiple-query-texts",
+    ),
+    pytest.param(
+        # n_results not specified, should default to 5
+        "documents", ["search term"], None,
+        call(query_texts=["search term"], n_results=5),
+        {
             "ids": [["doc1", "doc2", "doc3", "doc4", "doc5"]],
             "documents": [["Doc 1", "Doc 2", "Doc 3", "Doc 4", "Doc 5"]],
             "metadatas": [[{}, {}, {}, {}, {}]],
             "distances": [[0.1, 0.2, 0.3, 0.4, 0.5]]
-        }
-        mock_collection.query.return_value = mock_query_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "default-results",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "documents",
-                    "query_texts": ["search term"]
-                    # n_results not specified, should default to 5
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
+        },
+        id="default-n-results",
+    ),
+    pytest.param(
+        "documents", ["search term"], 1000,
+        call(query_texts=["search term"], n_results=1000), _EMPTY_RESULT,
+        id="large-n-results",
+    ),
+    pytest.param(
+        # Numeric strings and integral floats are coerced like any int field
+        "documents", ["search term"], "3",
+        call(query_texts=["search term"], n_results=3), _EMPTY_RESULT,
+        id="n-results-numeric-string",
+    ),
+    pytest.param(
+        "documents", ["search term"], 3.0,
+        call(query_texts=["search term"], n_results=3), _EMPTY_RESULT,
+        id="n-results-integral-float",
+    ),
+    pytest.param(
+        "empty_collection", ["nonexistent term"], None,
+        call(query_texts=["nonexistent term"], n_results=5), _EMPTY_RESULT,
+        id="empty-results",
+    ),
+    pytest.param(
+        "special_docs", ["query with @#$%^&*() characters"], 1,
+        call(query_texts=["query with @#$%^&*() characters"], n_results=1),
+        {
+            "ids": [["doc1"]],
+            "documents": [["Document with special chars: @#$%^&*()"]],
+            "metadatas": [[{}]],
+            "distances": [[0.1]]
+        },
+        id="special-characters",
+    ),
+    pytest.param(
+        "multilingual_docs", ["查询 émojis 🔍"], 2,
+        call(query_texts=["查询 émojis 🔍"], n_results=2),
+        {
+            "ids": [["doc1", "doc2"]],
+            "documents": [["Document with émojis 🚀", "中文文档"]],
+            "metadatas": [[{"lang": "en"}, {"lang": "zh"}]],
+            "distances": [[0.1, 0.2]]
+        },
+        id="unicode",
+    ),
+]
+
+
+_BASE = {
+    "jsonrpc": "2.0",
+    "method": "tools/call",
+    "params": {"name": "chroma.query", "arguments": None},
+}
+
+
+def _req(id_, args):
+    """Build a chroma.query tools/call request from the shared template."""
+    r = _BASE.copy()
+    r["id"] = id_
+    r["params"] = {**_BASE["params"], "arguments": args}
+    return r
+
+
+# Serialized once; (request body, expected status)
+_VALIDATION_CASES = [
+    pytest.param(orjson.dumps(_req(case_id, arguments)), status, id=case_id)
+    for case_id, arguments, status in [
+        ("missing_collection", {"query_texts": ["search term"]}, 422),
+        ("missing_query_texts", {"collection": "test_collection"}, 422),
+        # Empty query_texts list (should be valid)
+        ("empty_query_texts", {"collection": "test_collection", "query_texts": []}, 200),
+        ("invalid_n_results",
+         {"collection": "test_collection", "query_texts": ["search"], "n_results": "invalid"},
+         422),
+    ]
+]
+
+
+def _build_request(collection, query_texts, n_results=None):
+    """Build a query request; n_results is omitted when None."""
+    arguments = {"collection": collection, "query_texts": query_texts}
+    if n_results is not None:
+        arguments["n_results"] = n_results
+    return _req("query", arguments)
 
-        assert response.status_code == 200
-        mock_collection.query.assert_called_once_with(
-            query_texts=["search term"],
-            n_results=5  # Default value
-        )
-
-    def test_large_n_results(self, client, mock_chroma_setup):
-        """Test query with large n_results value."""
-        mock_client, mock_collection = mock_chroma_setup
-
-        mock_query_result = {
-            "ids": [[]],
-            "documents": [[]],
-            "metadatas": [[]],
-            "distances": [[]]
-        }
-        mock_collection.query.return_value = mock_query_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "large-results",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "documents",
-                    "query_texts": ["search term"],
-                    "n_results": 1000
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
 
-        assert response.status_code == 200
-        mock_collection.query.assert_called_once_with(
-            query_texts=["search term"],
-            n_results=1000
-        )
-
-    def test_empty_query_results(self, client, mock_chroma_setup):
-        """Test query that returns no results."""
-        mock_client, mock_collection = mock_chroma_setup
-
-        empty_result = {
-            "ids": [[]],
-            "documents": [[]],
-            "metadatas": [[]],
-            "distances": [[]]
-        }
-        mock_collection.query.return_value = empty_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "empty-results",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "empty_collection",
-                    "query_texts": ["nonexistent term"]
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
+class TestQuerySpecific:
+    """Specific tests for query functionality."""
 
-        assert response.status_code == 200
-        data = response.json()
-        assert data["result"] == empty_result
+    @pytest.fixture
+    def no_model_validation(self, monkeypatch):
+        """Fail the request if the server runs full pydantic validation on its envelope.
 
-    def test_query_with_special_characters(self, client, mock_chroma_setup):
-        """Test query with special characters."""
-        mock_client, mock_collection = mock_chroma_setup
+        Well-formed envelopes are decoded with model_construct, so happy-path
+        tests should never need it; tool arguments are still validated.
+        """
+        def fail(*args, **kwargs):
+            raise AssertionError("well-formed request went through model validation")
 
-        mock_query_result = {
-            "ids": [["doc1"]],
-            "documents": [["Document with special chars: @#$%^&*()"]],
-            "metadatas": [[{}]],
-            "distances": [[0.1]]
-        }
-        mock_collection.query.return_value = mock_query_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "special-chars",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "special_docs",
-                    "query_texts": ["query with @#$%^&*() characters"],
-                    "n_results": 1
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
+        monkeypatch.setattr(MCPRequest, "model_validate", fail)
+        monkeypatch.setattr(MCPRequest, "model_validate_json", fail)
+
+    @pytest.mark.usefixtures("no_model_validation")
+    @pytest.mark.parametrize(
+        "collection,query_texts,n_results_in,expected_call,mock_result",
+        _QUERY_CASES,
+    )
+    async def test_query_variants(self, test_client, patch_get_client, collection,
+                            query_texts, n_results_in, expected_call, mock_result):
+        """Test that query arguments reach Chroma and its result is returned."""
+        mock_client, mock_collection = patch_get_client
+        mock_collection.query.return_value = mock_result
+
+        request = _build_request(collection, query_texts, n_results_in)
+
+        response = await post_json(test_client, "/mcp", request)
 
         assert response.status_code == 200
-        mock_collection.query.assert_called_once_with(
-            query_texts=["query with @#$%^&*() characters"],
-            n_results=1
-        )
+        assert read_json(response)["result"] == mock_result
+
+        # Verify ChromaDB method calls
+        mock_client.get_collection.assert_called_once_with(collection)
+        # One comparison checks both the call count and the arguments
+        assert mock_collection.query.call_args_list == [expected_call]
 
-    def test_query_collection_not_found(self, client, mock_chroma_setup):
+    async def test_query_collection_not_found(self, test_client, patch_get_client):
         """Test query when collection doesn't exist."""
-        mock_client, _ = mock_chroma_setup
+        mock_client, _ = patch_get_client
         mock_client.get_collection.side_effect = Exception("Collection not found")
 
-        request = {
-            "jsonrpc": "2.0",
-            "id": "missing-collection",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "nonexistent_collection",
-                    "query_texts": ["search term"]
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
+        request = _req("missing-collection", {
+            "collection": "nonexistent_collection",
+            "query_texts": ["search term"]
+        })
+
+        response = await post_json(test_client, "/mcp", request)
 
         assert response.status_code == 500
 
-    def test_query_validation_errors(self, client):
+    @pytest.mark.parametrize("payload,expected_status", _VALIDATION_CASES)
+    async def test_query_validation_errors(self, test_client, patch_get_client, payload, expected_status):
         """Test query parameter validation."""
-        validation_test_cases = [
-            # Missing collection
-            {
-                "name": "chroma.query",
-                "arguments": {
-                    "query_texts": ["search term"]
-                }
-            },
-            # Missing query_texts
-            {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection"
-                }
-            },
-            # Empty query_texts list (should be valid)
-            {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection",
-                    "query_texts": []
-                }
-            },
-            # Invalid n_results type
-            {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection",
-                    "query_texts": ["search"],
-                    "n_results": "invalid"
-                }
-            }
-        ]
-
-        for i, params in enumerate(validation_test_cases):
-            request = {
-                "jsonrpc": "2.0",
-                "id": f"validation-{i}",
-                "method": "tools/call",
-                "params": params
-            }
-
-            response = client.post("/mcp", json=request)
-
-            if i == 2:  # Empty query_texts should be valid
-                assert response.status_code in [200, 500]  # Depends on ChromaDB mock
-            else:
-                assert response.status_code == 422  # Validation error
-
-    def test_query_with_unicode_content(self, client, mock_chroma_setup):
-        """Test query with Unicode content."""
-        mock_client, mock_collection = mock_chroma_setup
-
-        mock_query_result = {
-            "ids": [["doc1", "doc2"]],
-            "documents": [["Document with mojis =", "c+-"]],
-            "metadatas": [[{"lang": "en"}, {"lang": "zh"}]],
-            "distances": [[0.1, 0.2]]
-        }
-        mock_collection.query.return_value = mock_query_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "unicode-query",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "multilingual_docs",
-                    "query_texts": ["~ mojis ="],
-                    "n_results": 2
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
+        _, mock_collection = patch_get_client
+        mock_collection.query.return_value = _EMPTY_RESULT
 
-        assert response.status_code == 200
-        data = response.json()
-        assert data["result"] == mock_query_result
+        response = await test_client.post("/mcp", content=payload, headers=JSON_HEADERS)
+
+        # Status only; the 422 bodies are never decoded
+        assert response.status_code == expected_status
 
-    def test_query_response_format(self, client, mock_chroma_setup):
+    @pytest.mark.usefixtures("no_model_validation")
+    async def test_query_response_format(self, test_client, patch_get_client):
         """Test that query response follows MCP format."""
-        mock_client, mock_collection = mock_chroma_setup
+        _, mock_collection = patch_get_client
+        mock_collection.query.return_value = _SINGLE_RESULT
 
-        mock_query_result = {
-            "ids": [["doc1"]],
-            "documents": [["Test document"]],
-            "metadatas": [[{"test": "metadata"}]],
-            "distances": [[0.1]]
-        }
-        mock_collection.query.return_value = mock_query_result
-
-        request = {
-            "jsonrpc": "2.0",
-            "id": "format-test",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection",
-                    "query_texts": ["test query"]
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_client):
-            response = client.post("/mcp", json=request)
+        request = _req("format-test", {
+            "collection": "test_collection",
+            "query_texts": ["test query"]
+        })
+
+        response = await post_json(test_client, "/mcp", request)
 
         assert response.status_code == 200
-        data = response.json()
+        data = read_json(response)
 
         # Check MCP response format
         assert data["jsonrpc"] == "2.0"
         assert data["id"] == "format-test"
         assert "result" in data
-        assert data["result"] == mock_query_result
\ No newline at end of file
+        assert data["result"] == _SINGLE_RESULT
\ No newline at end of file
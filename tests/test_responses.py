@@ -0,0 +1,26 @@
+# tests/test_responses.py
+import numpy as np
+from app.responses import ORJSONResponse
+
+
+class TestORJSONResponse:
+    """Test cases for the orjson-backed response class."""
+
+    def test_render_dict(self):
+        """Test rendering a plain JSON-RPC payload."""
+        response = ORJSONResponse({"jsonrpc": "2.0", "id": 1, "result": "ok"})
+
+        assert response.body == b'{"jsonrpc":"2.0","id":1,"result":"ok"}'
+        assert response.media_type == "application/json"
+
+    def test_render_unicode(self):
+        """Test that non-ASCII text is emitted as UTF-8."""
+        response = ORJSONResponse({"documents": [["Grüße"]]})
+
+        assert response.body.decode("utf-8") == '{"documents":[["Grüße"]]}'
+
+    def test_render_numpy_array(self):
+        """Test that numpy arrays (e.g. embeddings) serialize natively."""
+        response = ORJSONResponse({"embeddings": np.array([[1.0, 2.0]])})
+
+        assert response.body == b'{"embeddings":[[1.0,2.0]]}'
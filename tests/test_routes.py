@@ -1,84 +1,248 @@
 # tests/test_routes.py
+import asyncio
+import orjson
 import pytest
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
-from fastapi.testclient import TestClient
-from fastapi import FastAPI
-from app.routes import router, get_client
-from app.main import app
+from chromadb.errors import NotFoundError
+from fastapi.exceptions import RequestValidationError
+from app.mcp_models import MCPRequest
+from app.routes import get_client, decode_request, dispatch
+from tests.helpers import post_json, read_json
+
+
+# (request payload, expected status, expected response subset; None for an
+# empty body)
+_JSONRPC_CASES = [
+    pytest.param(
+        {"jsonrpc": "2.0", "id": "test-123", "method": "initialize"}, 200,
+        {
+            "jsonrpc": "2.0",
+            "id": "test-123",
+            "result": {
+                "protocolVersion": "2024-11-05",
+                "serverInfo": {"name": "chroma-mcp-http-server", "version": "0.1.0"},
+                "capabilities": {"tools": {"supported": True, "listChanged": True}},
+            },
+        },
+        id="initialize",
+    ),
+    pytest.param(
+        {"jsonrpc": "2.0", "method": "notifications/initialized"}, 202, None,
+        id="notifications-initialized",
+    ),
+    pytest.param(
+        {"jsonrpc": "2.0", "id": "test-456", "method": "tools/list"}, 200,
+        {"jsonrpc": "2.0", "id": "test-456"},
+        id="tools-list",
+    ),
+    pytest.param(
+        {"jsonrpc": "2.0", "id": "error-test", "method": "unknown/method"}, 200,
+        {
+            "jsonrpc": "2.0",
+            "id": "error-test",
+            "error": {"code": -32601, "message": "Method not found: unknown/method"},
+        },
+        id="unknown-method",
+    ),
+    pytest.param(
+        {"jsonrpc": "2.0", "method": "initialize"}, 200,
+        {"jsonrpc": "2.0", "id": None},
+        id="without-id",
+    ),
+]
+
+
+# Request bodies and Chroma results, built once at import
+_WIRE_INIT_REQ = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {}
+}
+
+_QUERY_REQ = {
+    "jsonrpc": "2.0",
+    "id": "query-test",
+    "method": "tools/call",
+    "params": {
+        "name": "chroma.query",
+        "arguments": {
+            "collection": "test_collection",
+            "query_texts": ["test query"],
+            "n_results": 3
+        }
+    }
+}
+
+_QUERY_RESULT = {
+    "ids": [["id1", "id2"]],
+    "documents": [["doc1", "doc2"]],
+    "metadatas": [[{"key": "value"}, None]],
+    "distances": [[0.1, 0.2]]
+}
+
+_ADD_REQ = {
+    "jsonrpc": "2.0",
+    "id": "add-test",
+    "method": "tools/call",
+    "params": {
+        "name": "chroma.add_texts",
+        "arguments": {
+            "collection": "test_collection",
+            "ids": ["id1", "id2"],
+            "documents": ["doc1", "doc2"],
+            "metadatas": [{"key": "value"}, {"key2": "value2"}]
+        }
+    }
+}
+
+_ADD_NO_META_REQ = {
+    "jsonrpc": "2.0",
+    "id": "add-no-meta",
+    "method": "tools/call",
+    "params": {
+        "name": "chroma.add_texts",
+        "arguments": {
+            "collection": "test_collection",
+            "ids": ["id1"],
+            "documents": ["doc1"]
+        }
+    }
+}
+
+_DIRECT_QUERY_REQ = {
+    "jsonrpc": "2.0",
+    "id": "direct-query",
+    "method": "tools/query",
+    "params": {
+        "collection": "test_collection",
+        "query_texts": ["test query"],
+        "n_results": 1
+    }
+}
+
+_DIRECT_ADD_REQ = {
+    "jsonrpc": "2.0",
+    "id": "direct-add",
+    "method": "tools/add_texts",
+    "params": {
+        "collection": "test_collection",
+        "ids": ["id1"],
+        "documents": ["doc1"]
+    }
+}
+
+_UNKNOWN_TOOL_REQ = {
+    "jsonrpc": "2.0",
+    "id": "unknown-test",
+    "method": "tools/call",
+    "params": {
+        "name": "unknown.tool",
+        "arguments": {}
+    }
+}
+
+_INVALID_QUERY_REQ = {
+    "jsonrpc": "2.0",
+    "id": "invalid-query",
+    "method": "tools/call",
+    "params": {
+        "name": "chroma.query",
+        "arguments": {
+            "collection": "test_collection"
+            # Missing required query_texts
+        }
+    }
+}
+
+_MISMATCHED_ADD_REQ = {
+    "jsonrpc": "2.0",
+    "id": "mismatched-add",
+    "method": "tools/call",
+    "params": {
+        "name": "chroma.add_texts",
+        "arguments": {
+            "collection": "test_collection",
+            "ids": ["a1", "a2"],
+            "documents": ["A1"]
+        }
+    }
+}
+
+# A query with the default n_results, for the Chroma failure tests
+_PLAIN_QUERY_REQ = {
+    "jsonrpc": "2.0",
+    "id": "plain-query",
+    "method": "tools/call",
+    "params": {
+        "name": "chroma.query",
+        "arguments": {
+            "collection": "test_collection",
+            "query_texts": ["test query"]
+        }
+    }
+}
+
+_QUERY_ARGS = {"collection": "test_collection", "query_texts": ["test query"]}
+_ADD_ARGS = {"collection": "test_collection", "ids": ["id1"], "documents": ["doc1"]}
+
+# (tool, arguments, location of the rejected argument, Pydantic error type)
+_INVALID_ARGUMENT_CASES = [
+    pytest.param("chroma.query", {**_QUERY_ARGS, "collection": 1}, ["collection"],
+                 "string_type", id="query-collection"),
+    pytest.param("chroma.query", {**_QUERY_ARGS, "query_texts": 123}, ["query_texts"],
+                 "list_type", id="query-texts-not-list"),
+    pytest.param("chroma.query", {**_QUERY_ARGS, "query_texts": [1]}, ["query_texts", 0],
+                 "string_type", id="query-texts-not-strings"),
+    pytest.param("chroma.query", {**_QUERY_ARGS, "n_results": [1]}, ["n_results"],
+                 "int_type", id="n-results-list"),
+    pytest.param("chroma.query", {**_QUERY_ARGS, "n_results": "x"}, ["n_results"],
+                 "int_parsing", id="n-results-string"),
+    pytest.param("chroma.add_texts", {**_ADD_ARGS, "ids": 5}, ["ids"],
+                 "list_type", id="add-ids"),
+    pytest.param("chroma.add_texts", {**_ADD_ARGS, "documents": "doc1"}, ["documents"],
+                 "list_type", id="add-documents"),
+    pytest.param("chroma.add_texts", {**_ADD_ARGS, "metadatas": {"k": "v"}}, ["metadatas"],
+                 "list_type", id="add-metadatas"),
+    pytest.param("chroma.query", ["test_collection"], [], "model_type",
+                 id="arguments-not-object"),
+]
+
+
+def _raise_not_found(**kwargs):
+    raise NotFoundError("Collection does not exist")
 
 
 class TestMCPRoutes:
     """Test cases for MCP protocol routes."""
 
     @pytest.fixture
-    def client(self):
-        """Create test client."""
-        return TestClient(app)
-
-    @pytest.fixture
-    def mock_chroma_client(self):
-        """Mock ChromaDB client."""
-        return Mock()
+    def mock_chroma_client(self, patch_get_client):
+        """Mock ChromaDB client that app.routes.get_client returns."""
+        return patch_get_client[0]
 
     @pytest.fixture
-    def mock_collection(self):
-        """Mock ChromaDB collection."""
-        return Mock()
+    def mock_collection(self, patch_get_client):
+        """Mock ChromaDB collection the mock client hands out."""
+        return patch_get_client[1]
 
-    def test_initialize_method(self, client):
-        """Test initialize method response."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "test-123",
-            "method": "initialize"
-        }
-
-        with patch('app.routes.get_client'):
-            response = client.post("/mcp", json=request_data)
-
-        assert response.status_code == 200
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == "test-123"
-        assert "result" in data
-        assert data["result"]["protocolVersion"] == "2024-11-05"
-        assert data["result"]["serverInfo"]["name"] == "chroma-mcp-http-server"
-        assert data["result"]["serverInfo"]["version"] == "0.1.0"
-        assert data["result"]["capabilities"]["tools"]["supported"] is True
-
-    def test_notifications_initialized(self, client):
-        """Test notifications/initialized method."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "method": "notifications/initialized"
-        }
-
-        with patch('app.routes.get_client'):
-            response = client.post("/", json=request_data)
+    def test_initialize_wire_format(self, client):
+        """Test that the pre-serialized initialize body matches the documented payload."""
+        response = post_json(client, "/mcp", _WIRE_INIT_REQ)
 
         assert response.status_code == 200
-        data = response.json()
-        assert data == {}
+        assert response.content == (
+            b'{"jsonrpc":"2.0","id":1,"result":{"protocolVersion":"2024-11-05",'
+            b'"serverInfo":{"name":"chroma-mcp-http-server","version":"0.1.0"},'
+            b'"capabilities":{"tools":{"supported":true,"listChanged":true}}}}'
+        )
 
     def test_tools_list_method(self, client):
-        """Test tools/list method response."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "test-456",
-            "method": "tools/list"
-        }
-
-        with patch('app.routes.get_client'):
-            response = client.post("/mcp", json=request_data)
-
-        assert response.status_code == 200
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == "test-456"
-        assert "result" in data
-        assert "tools" in data["result"]
+        """Test the tool definitions returned by tools/list."""
+        response = post_json(client, "/mcp", {"jsonrpc": "2.0", "id": "test-456", "method": "tools/list"})
 
-        tools = data["result"]["tools"]
+        tools = read_json(response)["result"]["tools"]
         assert len(tools) == 2
 
         # Check chroma.query tool
@@ -93,40 +257,35 @@ class TestMCPRoutes:
         assert "inputSchema" in add_tool
         assert add_tool["inputSchema"]["required"] == ["collection", "ids", "documents"]
 
+    def test_tools_list_spliced_ids(self, client):
+        """Test that the pre-serialized tools/list body carries any id type."""
+        for request_id in ["str-id", 42, None]:
+            response = post_json(client, "/mcp", {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": "tools/list"
+            })
+
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/json"
+            data = read_json(response)
+            assert data["jsonrpc"] == "2.0"
+            assert data["id"] == request_id
+            assert len(data["result"]["tools"]) == 2
+
     def test_chroma_query_tool_call(self, client, mock_chroma_client, mock_collection):
         """Test chroma.query tool call."""
         # Setup mocks
-        mock_query_result = {
-            "ids": [["id1", "id2"]],
-            "documents": [["doc1", "doc2"]],
-            "metadatas": [[{"key": "value"}, None]],
-            "distances": [[0.1, 0.2]]
-        }
-        mock_collection.query.return_value = mock_query_result
+        mock_collection.query.return_value = _QUERY_RESULT
         mock_chroma_client.get_collection.return_value = mock_collection
 
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "query-test",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection",
-                    "query_texts": ["test query"],
-                    "n_results": 3
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_chroma_client):
-            response = client.post("/", json=request_data)
+        response = post_json(client, "/", _QUERY_REQ)
 
         assert response.status_code == 200
-        data = response.json()
+        data = read_json(response)
         assert data["jsonrpc"] == "2.0"
         assert data["id"] == "query-test"
-        assert data["result"] == mock_query_result
+        assert data["result"] == _QUERY_RESULT
 
         # Verify ChromaDB calls
         mock_chroma_client.get_collection.assert_called_once_with("test_collection")
@@ -139,26 +298,10 @@ class TestMCPRoutes:
         """Test chroma.add_texts tool call."""
         mock_chroma_client.get_or_create_collection.return_value = mock_collection
 
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "add-test",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.add_texts",
-                "arguments": {
-                    "collection": "test_collection",
-                    "ids": ["id1", "id2"],
-                    "documents": ["doc1", "doc2"],
-                    "metadatas": [{"key": "value"}, {"key2": "value2"}]
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_chroma_client):
-            response = client.post("/mcp", json=request_data)
+        response = post_json(client, "/mcp", _ADD_REQ)
 
         assert response.status_code == 200
-        data = response.json()
+        data = read_json(response)
         assert data["jsonrpc"] == "2.0"
         assert data["id"] == "add-test"
         assert data["result"] == "ok"
@@ -175,25 +318,10 @@ class TestMCPRoutes:
         """Test chroma.add_texts tool call without metadata."""
         mock_chroma_client.get_or_create_collection.return_value = mock_collection
 
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "add-no-meta",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.add_texts",
-                "arguments": {
-                    "collection": "test_collection",
-                    "ids": ["id1"],
-                    "documents": ["doc1"]
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_chroma_client):
-            response = client.post("/", json=request_data)
+        response = post_json(client, "/", _ADD_NO_META_REQ)
 
         assert response.status_code == 200
-        data = response.json()
+        data = read_json(response)
         assert data["result"] == "ok"
 
         # Verify ChromaDB calls - metadatas should be None
@@ -203,163 +331,203 @@ class TestMCPRoutes:
             metadatas=None
         )
 
-    def test_unknown_tool_call(self, client):
-        """Test unknown tool call returns error."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "unknown-test",
-            "method": "tools/call",
-            "params": {
-                "name": "unknown.tool",
-                "arguments": {}
-            }
-        }
+    def test_direct_tools_query_method(self, client, mock_chroma_client, mock_collection):
+        """Test the tools/query method, which takes tool arguments as params."""
+        mock_collection.query.return_value = {"ids": [["id1"]]}
+        mock_chroma_client.get_collection.return_value = mock_collection
 
-        with patch('app.routes.get_client'):
-            response = client.post("/mcp", json=request_data)
+        response = post_json(client, "/mcp", _DIRECT_QUERY_REQ)
 
         assert response.status_code == 200
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == "unknown-test"
-        assert "error" in data
-        # Should fall through to method not found
+        assert read_json(response)["result"] == {"ids": [["id1"]]}
+        mock_collection.query.assert_called_once_with(
+            query_texts=["test query"],
+            n_results=1
+        )
 
-    def test_unknown_method(self, client):
-        """Test unknown method returns JSON-RPC error."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "error-test",
-            "method": "unknown/method"
-        }
+    def test_direct_tools_add_texts_method(self, client, mock_chroma_client, mock_collection):
+        """Test the tools/add_texts method, which takes tool arguments as params."""
+        mock_chroma_client.get_or_create_collection.return_value = mock_collection
 
-        with patch('app.routes.get_client'):
-            response = client.post("/", json=request_data)
+        response = post_json(client, "/mcp", _DIRECT_ADD_REQ)
 
         assert response.status_code == 200
-        data = response.json()
-        assert data["jsonrpc"] == "2.0"
-        assert data["id"] == "error-test"
-        assert "error" in data
-        assert data["error"]["code"] == -32601
-        assert "Method not found" in data["error"]["message"]
-        assert "unknown/method" in data["error"]["message"]
-
-    def test_request_without_id(self, client):
-        """Test request without ID."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "method": "initialize"
-        }
+        assert read_json(response)["result"] == "ok"
+        mock_collection.add.assert_called_once_with(
+            ids=["id1"],
+            documents=["doc1"],
+            metadatas=None
+        )
 
-        with patch('app.routes.get_client'):
-            response = client.post("/mcp", json=request_data)
+    @pytest.mark.parametrize("name", ["unknown.tool", ["chroma.query"], {"a": 1}, None])
+    def test_unknown_tool_call(self, client, name):
+        """Test unknown or non-string tool names return method not found."""
+        response = post_json(client, "/mcp", {
+            **_UNKNOWN_TOOL_REQ,
+            "params": {**_UNKNOWN_TOOL_REQ["params"], "name": name},
+        })
 
         assert response.status_code == 200
-        data = response.json()
+        data = read_json(response)
         assert data["jsonrpc"] == "2.0"
-        assert data["id"] is None
+        assert data["id"] == "unknown-test"
+        assert data["error"]["code"] == -32601
 
     def test_invalid_query_params(self, client, mock_chroma_client):
         """Test chroma.query with invalid parameters."""
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "invalid-query",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection"
-                    # Missing required query_texts
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_chroma_client):
-            response = client.post("/", json=request_data)
+        response = post_json(client, "/", _INVALID_QUERY_REQ)
 
         # Should return 422 for validation error
         assert response.status_code == 422
 
-    def test_invalid_add_texts_params(self, client, mock_chroma_client):
-        """Test chroma.add_texts with invalid parameters."""
-        request_data = {
+    @pytest.mark.parametrize("name,arguments,loc,error_type", _INVALID_ARGUMENT_CASES)
+    def test_invalid_argument_types(self, client, mock_collection, name, arguments, loc,
+                                    error_type):
+        """Test that tool arguments of the wrong type are rejected with a 422."""
+        response = post_json(client, "/mcp", {
             "jsonrpc": "2.0",
-            "id": "invalid-add",
+            "id": "invalid-type",
             "method": "tools/call",
-            "params": {
-                "name": "chroma.add_texts",
-                "arguments": {
-                    "collection": "test_collection"
-                    # Missing required ids and documents
-                }
-            }
-        }
+            "params": {"name": name, "arguments": arguments},
+        })
+
+        assert response.status_code == 422
+        error = read_json(response)["detail"][0]
+        assert error["loc"] == ["body", "params", "arguments", *loc]
+        assert error["type"] == error_type
+        mock_collection.query.assert_not_called()
+        mock_collection.add.assert_not_called()
 
-        with patch('app.routes.get_client', return_value=mock_chroma_client):
-            response = client.post("/mcp", json=request_data)
+    def test_mismatched_add_texts_lengths(self, client, mock_collection):
+        """Test that ids and documents of different lengths are rejected."""
+        response = post_json(client, "/mcp", _MISMATCHED_ADD_REQ)
 
-        # Should return 422 for validation error
         assert response.status_code == 422
+        mock_collection.add.assert_not_called()
 
     def test_chroma_client_exception(self, client, mock_chroma_client):
         """Test handling of ChromaDB client exceptions."""
         mock_chroma_client.get_collection.side_effect = Exception("ChromaDB error")
 
-        request_data = {
-            "jsonrpc": "2.0",
-            "id": "exception-test",
-            "method": "tools/call",
-            "params": {
-                "name": "chroma.query",
-                "arguments": {
-                    "collection": "test_collection",
-                    "query_texts": ["test query"]
-                }
-            }
-        }
-
-        with patch('app.routes.get_client', return_value=mock_chroma_client):
-            response = client.post("/", json=request_data)
+        response = post_json(client, "/", _PLAIN_QUERY_REQ)
 
         # The exception should propagate and result in 500 error
         assert response.status_code == 500
 
+    def test_stale_collection_is_refetched(self, client, mock_chroma_client):
+        """Test that a NotFoundError on a cached handle triggers one re-fetch."""
+        # Plain doubles: only the client's calls are asserted on
+        stale = SimpleNamespace(query=_raise_not_found)
+        fresh = SimpleNamespace(query=lambda **kwargs: {"ids": [["id1"]]})
+        mock_chroma_client.get_collection.side_effect = [stale, fresh]
 
-class TestGetClientDependency:
-    """Test the get_client dependency function."""
+        response = post_json(client, "/mcp", _PLAIN_QUERY_REQ)
 
-    @patch('app.routes.get_chroma_client')
-    @patch('app.routes.settings')
-    def test_get_client_calls_with_settings(self, mock_settings, mock_get_chroma_client):
-        """Test that get_client uses settings correctly."""
-        # Setup mock settings
-        mock_settings.chroma_host = "test-host"
-        mock_settings.chroma_port = 9000
-        mock_settings.chroma_ssl = True
+        assert response.status_code == 200
+        assert read_json(response)["result"] == {"ids": [["id1"]]}
+        assert mock_chroma_client.get_collection.call_count == 2
 
-        mock_client = Mock()
-        mock_get_chroma_client.return_value = mock_client
 
-        # Call the dependency function
-        result = get_client()
+class TestDecodeRequest:
+    """Test the raw-body request decoder."""
 
-        # Verify correct calls
-        mock_get_chroma_client.assert_called_once_with(
-            host="test-host",
-            port=9000,
-            ssl=True
+    def test_fast_path(self):
+        """Test decoding a well-formed envelope."""
+        req = decode_request(
+            b'{"jsonrpc":"2.0","id":7,"method":"tools/call","params":{"name":"x"}}'
         )
-        assert result == mock_client
 
+        assert req.jsonrpc == "2.0"
+        assert req.id == 7
+        assert req.method == "tools/call"
+        assert req.params == {"name": "x"}
+
+    def test_fast_path_defaults(self):
+        """Test that omitted optional fields get their model defaults."""
+        req = decode_request(b'{"method":"initialize"}')
+
+        assert req.jsonrpc == "2.0"
+        assert req.id is None
+        assert req.params is None
+
+    def test_invalid_json(self):
+        """Test that malformed JSON is reported as a validation error."""
+        with pytest.raises(RequestValidationError) as exc_info:
+            decode_request(b"invalid json")
+
+        assert exc_info.value.errors()[0]["type"] == "json_invalid"
+
+    def test_missing_method(self):
+        """Test that a missing method falls back to model validation."""
+        with pytest.raises(RequestValidationError) as exc_info:
+            decode_request(b'{"jsonrpc":"2.0","id":1}')
+
+        assert exc_info.value.errors()[0]["loc"] == ("body", "method")
+
+    def test_invalid_params_type(self):
+        """Test that non-object params are rejected."""
+        with pytest.raises(RequestValidationError):
+            decode_request(b'{"method":"tools/call","params":[1,2]}')
+
+
+class TestDispatch:
+    """Test dispatching decoded requests without the HTTP layer."""
+
+    @pytest.mark.parametrize("payload,status,expected", _JSONRPC_CASES)
+    def test_jsonrpc(self, payload, status, expected):
+        """Test the fixed-response JSON-RPC methods."""
+        # Routing only; the HTTP round trip is covered by TestMCPRoutes
+        response = asyncio.run(dispatch(MCPRequest(**payload)))
+
+        assert response.status_code == status
+        if expected is None:
+            assert response.body == b""
+        else:
+            assert orjson.loads(response.body).items() >= expected.items()
+
+    def test_tools_list(self):
+        """Test that tools/list is served from the pre-encoded envelope."""
+        response = asyncio.run(dispatch(MCPRequest(id=2, method="tools/list")))
+
+        data = orjson.loads(response.body)
+        assert data["id"] == 2
+        assert [tool["name"] for tool in data["result"]["tools"]] == [
+            "chroma.query", "chroma.add_texts"
+        ]
+
+    @pytest.mark.parametrize("name,missing", [
+        pytest.param("chroma.query", ["query_texts"], id="query"),
+        pytest.param("chroma.add_texts", ["ids", "documents"], id="add-texts"),
+    ])
+    def test_missing_tool_arguments(self, name, missing):
+        """Test that tool calls missing required arguments are rejected."""
+        # The 422 response itself is covered by TestMCPRoutes.test_invalid_query_params
+        request = MCPRequest(id=3, method="tools/call", params={
+            "name": name,
+            "arguments": {"collection": "test_collection"},
+        })
+
+        with pytest.raises(RequestValidationError) as exc_info:
+            asyncio.run(dispatch(request))
+
+        assert [error["loc"][-1] for error in exc_info.value.errors()] == missing
+
+
+class TestGetClientDependency:
+    """Test the get_client dependency function."""
+
+    @pytest.mark.parametrize("host,port,ssl", [
+        ("test-host", 9000, True),
+        ("localhost", 8000, False),
+    ])
     @patch('app.routes.get_chroma_client')
     @patch('app.routes.settings')
-    def test_get_client_with_different_settings(self, mock_settings, mock_get_chroma_client):
-        """Test get_client with different settings values."""
-        # Setup different mock settings
-        mock_settings.chroma_host = "localhost"
-        mock_settings.chroma_port = 8000
-        mock_settings.chroma_ssl = False
+    def test_get_client(self, mock_settings, mock_get_chroma_client, host, port, ssl):
+        """Test that get_client passes the connection settings through."""
+        mock_settings.chroma_host = host
+        mock_settings.chroma_port = port
+        mock_settings.chroma_ssl = ssl
+        mock_settings.chroma_http2 = False
 
         mock_client = Mock()
         mock_get_chroma_client.return_value = mock_client
@@ -369,8 +537,9 @@ class TestGetClientDependency:
 
         # Verify correct calls
         mock_get_chroma_client.assert_called_once_with(
-            host="localhost",
-            port=8000,
-            ssl=False
+            host=host,
+            port=port,
+            ssl=ssl,
+            http2=False
         )
-        assert result == mock_client
\ No newline at end of file
+        assert result == mock_client